@@ -0,0 +1,399 @@
+"""Benchmarks of the ingestion, charting, statistics and forecasting hot paths.
+
+Synthetic data is generated once per size under ``benchmarks/.data``: GeoTIFFs of
+a continuous variable and of land-cover classes, the same grids as per-year CSVs,
+and a store ingested from the GeoTIFFs. Every case then runs in a fresh Python
+process pointed at that store (``SAHEL_STORE``), so its peak RSS is its own, and
+the timings are written to JSON together with the commit they were measured on:
+
+    python benchmarks/bench.py --size assaba --years 5 --repeat 3
+    python benchmarks/bench.py --size sahel --case extract --case ingest
+
+Sizes go from the Assaba extent the app ships with up to the whole Sahel belt at
+the same ~500 m resolution.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_FOLDER = Path(__file__).resolve().parent / ".data"
+RESULTS_FOLDER = Path(__file__).resolve().parent / "results"
+
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "ml"))
+sys.path.append(str(ROOT / "website"))
+
+FIRST_YEAR = 2010
+NODATA = -9999.0
+CLASSES = np.array([7, 10, 13, 16], dtype=np.float32)
+BLOCK = 256
+
+
+@dataclass(frozen=True)
+class Size:
+    west: float
+    north: float
+    east: float
+    south: float
+    resolution: float  # degrees
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (
+            round((self.north - self.south) / self.resolution),
+            round((self.east - self.west) / self.resolution),
+        )
+
+
+SIZES = {
+    "assaba": Size(-12.85, 18.31, -10.58, 15.11, 0.00436),
+    "mauritania": Size(-17.1, 27.3, -4.8, 14.7, 0.00436),
+    "sahel": Size(-18.0, 20.0, 40.0, 10.0, 0.00436),
+}
+
+
+# Synthetic data
+
+
+def _field(size: Size, rows: slice, year: int) -> np.ndarray:
+    """A smooth, slowly drifting float32 field with noise, NaN outside an ellipse."""
+    n_rows, n_cols = size.shape
+    lat = size.north - (np.arange(rows.start, rows.stop) + 0.5) * size.resolution
+    lon = size.west + (np.arange(n_cols) + 0.5) * size.resolution
+    drift = (year - FIRST_YEAR) * 0.05
+
+    field = 100 * (1 + np.sin(lon * 3 + drift)[None, :] * np.cos(lat * 2)[:, None])
+    rng = np.random.default_rng([year, rows.start])
+    field = (field + rng.normal(0, 10, field.shape)).astype(np.float32)
+
+    # An elliptical footprint, like an administrative region inside its bounding box
+    y = (np.arange(rows.start, rows.stop)[:, None] + 0.5) / n_rows * 2 - 1
+    x = (np.arange(n_cols)[None, :] + 0.5) / n_cols * 2 - 1
+    field[x**2 + y**2 > 1] = np.nan
+    return field
+
+
+def _classes(field: np.ndarray) -> np.ndarray:
+    index = np.clip((np.nan_to_num(field) - 20) // 45, 0, len(CLASSES) - 1).astype(np.int64)
+    return np.where(np.isnan(field), np.nan, CLASSES[index])
+
+
+def _strips(size: Size) -> list[slice]:
+    rows = size.shape[0]
+    step = max(BLOCK, (1 << 22) // max(size.shape[1], 1) // BLOCK * BLOCK)
+    return [slice(top, min(top + step, rows)) for top in range(0, rows, step)]
+
+
+def _write_tiff(path: Path, size: Size, year: int, categorical: bool) -> None:
+    import rasterio
+    from rasterio.transform import from_origin
+    from rasterio.windows import Window
+
+    rows, cols = size.shape
+    profile = dict(
+        driver="GTiff", width=cols, height=rows, count=1,
+        dtype="uint8" if categorical else "float32",
+        nodata=255 if categorical else NODATA,
+        crs="EPSG:4326",
+        transform=from_origin(size.west, size.north, size.resolution, size.resolution),
+        tiled=True, blockxsize=BLOCK, blockysize=BLOCK, compress="deflate",
+    )
+    with rasterio.open(path, "w", **profile) as dst:
+        for strip in _strips(size):
+            field = _field(size, strip, year)
+            if categorical:
+                field = _classes(field)
+            data = np.where(np.isnan(field), profile["nodata"], field).astype(profile["dtype"])
+            dst.write(data, 1, window=Window(0, strip.start, cols, strip.stop - strip.start))
+
+
+def _write_csv(path: Path, size: Size, year: int) -> None:
+    lon = size.west + (np.arange(size.shape[1]) + 0.5) * size.resolution
+    with open(path, "w") as file:
+        file.write("lon,lat,value\n")
+        for strip in _strips(size):
+            field = _field(size, strip, year)
+            rows, cols = np.nonzero(~np.isnan(field))
+            lat = size.north - (strip.start + rows + 0.5) * size.resolution
+            np.savetxt(file, np.column_stack([lon[cols], lat, field[rows, cols]]), fmt="%.6f", delimiter=",")
+
+
+def prepare(name: str, years: int, force: bool = False) -> Path:
+    """Generate (or reuse) the synthetic GeoTIFFs, CSVs and store of a size."""
+    size = SIZES[name]
+    data = DATA_FOLDER / f"{name}-{years}"
+    marker = data / "ready.json"
+    if marker.exists() and not force:
+        return data
+
+    shutil.rmtree(data, ignore_errors=True)
+    for dataset, categorical in (("population_density", False), ("land_cover", True)):
+        (data / "tiff" / dataset).mkdir(parents=True)
+        for year in range(FIRST_YEAR, FIRST_YEAR + years):
+            _write_tiff(data / "tiff" / dataset / f"{year}.tif", size, year, categorical)
+    (data / "csv" / "population_density").mkdir(parents=True)
+    for year in range(FIRST_YEAR, FIRST_YEAR + years):
+        _write_csv(data / "csv" / "population_density" / f"{year}.csv", size, year)
+
+    # The store is ingested by a child process, since it reads SAHEL_STORE on import
+    subprocess.run(
+        [sys.executable, __file__, "--ingest", "--data", str(data)],
+        check=True,
+        env={**os.environ, "SAHEL_STORE": str(data / "store")},
+    )
+    marker.write_text(json.dumps({"size": asdict(size), "years": years}))
+    return data
+
+
+def _ingest_store(data: Path) -> None:
+    from sahel import raster, store
+
+    for folder in sorted((data / "tiff").iterdir()):
+        frames = {int(tiff.stem): raster.extract(tiff) for tiff in sorted(folder.glob("*.tif"))}
+        store.write_years(folder.name, frames)
+
+
+# Cases: each returns the function to time, after its untimed setup
+
+CASES: dict[str, Callable[[Path], Callable[[], dict]]] = {}
+
+
+def case(name: str):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+@case("extract")
+def _extract(data: Path):
+    from sahel import raster
+
+    tiffs = sorted((data / "tiff" / "population_density").glob("*.tif"))
+
+    def run():
+        return {"pixels": sum(len(raster.extract(tiff)) for tiff in tiffs)}
+
+    return run
+
+
+@case("ingest")
+def _ingest(data: Path):
+    from sahel import raster, store
+
+    tiffs = sorted((data / "tiff" / "population_density").glob("*.tif"))
+    frames = {int(tiff.stem): raster.extract(tiff) for tiff in tiffs}
+    # A scratch store, so the other cases never see the benchmark dataset
+    store.STORE_FOLDER = data / "scratch-store"
+
+    def run():
+        shutil.rmtree(store.STORE_FOLDER, ignore_errors=True)
+        store.write_years("benchmark", frames)
+        return {"pixels": sum(len(frame) for frame in frames.values())}
+
+    return run
+
+
+def _statistics_script():
+    spec = importlib.util.spec_from_file_location("statistics_script", ROOT / "dataset" / "csv" / "script.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # the process pool pickles its functions by module
+    spec.loader.exec_module(module)
+    return module
+
+
+@case("statistics-store")
+def _statistics_store(data: Path):
+    script = _statistics_script()
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = script.iterate_datasets(script.store_jobs())
+        return {"datasets": len(summary)}
+
+    return run
+
+
+@case("statistics-csv")
+def _statistics_csv(data: Path):
+    script = _statistics_script()
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = script.iterate_datasets(script.csv_jobs(data / "csv"))
+        return {"files": sum(len(entry["year"]) for entry in summary.values())}
+
+    return run
+
+
+def _chart(dataset: str, mode: str):
+    def setup(data: Path):
+        import utils
+        from cache import shared_cache
+
+        year = utils.store.years(dataset)[-1]
+        utils.load_pyramid(dataset)  # pyramids are built at ingestion, not per chart
+
+        def run():
+            # Built figures are dropped; the pyramid stays in the module's own cache
+            shared_cache.clear()
+            figure = utils.create_chart(dataset, year, mode)
+            return {"payload_bytes": len(figure.to_json())}
+
+        return run
+
+    return setup
+
+
+CASES["chart-points"] = _chart("population_density", "points")
+CASES["chart-image"] = _chart("population_density", "image")
+CASES["chart-classes"] = _chart("land_cover", "image")
+
+
+@case("forecast-arima")
+def _forecast_arima(data: Path):
+    from forecast import forecast, load_matrix
+
+    _, _, matrix = load_matrix("population_density")
+
+    def run():
+        predictions, fitted, _ = forecast(matrix, order=(2, 1, 0), steps=5, min_obs=3)
+        return {"pixels": len(matrix), "fitted": int(fitted.sum())}
+
+    return run
+
+
+@case("forecast-markov")
+def _forecast_markov(data: Path):
+    from markov import forecast_classes
+    from sahel.cube import RasterCube
+
+    cube = RasterCube.from_store("land_cover")
+
+    def run():
+        predictions, _ = forecast_classes(cube, steps=5)
+        return {"cells": int(predictions.mask.sum())}
+
+    return run
+
+
+# Runner
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss * scale / 2**20
+
+
+def run_case(name: str, data: Path, repeat: int) -> dict:
+    """Time one case in this process; meant to run in a fresh interpreter."""
+    start = time.perf_counter()
+    run = CASES[name](data)
+    setup_seconds = time.perf_counter() - start
+
+    timings, details = [], {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        details = run()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "case": name,
+        "setup_seconds": setup_seconds,
+        "seconds": min(timings),
+        "median_seconds": float(np.median(timings)),
+        "timings": timings,
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_children_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+        **details,
+    }
+
+
+def _commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data, chart and forecast hot paths")
+    parser.add_argument("--size", choices=sorted(SIZES), default="assaba")
+    parser.add_argument("--years", type=int, default=5, help="synthetic years per dataset")
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="only these cases")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="JSON file (default: benchmarks/results/<commit>-<size>.json)")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the synthetic data")
+    # Internal: run a single case, or ingest the synthetic store, in a child process
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--ingest", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--data", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.ingest:
+        _ingest_store(args.data)
+        return
+    if args.run:
+        print(json.dumps(run_case(args.run, args.data, args.repeat)))
+        return
+
+    data = prepare(args.size, args.years, args.regenerate)
+    results = []
+    for name in args.case or CASES:
+        # A fresh interpreter per case, so peak RSS is not inherited from earlier cases
+        output = subprocess.run(
+            [sys.executable, __file__, "--run", name, "--data", str(data), "--repeat", str(args.repeat)],
+            check=True,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "SAHEL_STORE": str(data / "store")},
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{name:18} {result['seconds']:8.3f} s  {result['peak_rss_mb']:8.0f} MB")
+
+    commit = _commit()
+    report = {
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "size": args.size,
+        "extent": asdict(SIZES[args.size]),
+        "shape": SIZES[args.size].shape,
+        "years": args.years,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    output = args.output or RESULTS_FOLDER / f"{(commit or 'unknown')[:12]}-{args.size}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,71 @@
+import argparse
+import json
 import os
-import csv
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
-def calculate_average(file_path):
-    with open(file_path, mode='r') as file:
-        csv_reader = csv.reader(file)
-        next(csv_reader)  # Skip header if there is one
-        total = 0
-        count = 0
-        for row in csv_reader:
-            if len(row) >= 3:
-                total += float(row[2])
-                count += 1
-        return total / count if count > 0 else 0
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from sahel import store  # noqa: E402
+from sahel.stats import csv_statistics, year_statistics  # noqa: E402
 
-def calculate_min(file_path):
-    with open(file_path, mode='r') as file:
-        csv_reader = csv.reader(file)
-        next(csv_reader)  # Skip header if there is one
-        min = float('inf')
-        for row in csv_reader:
-            if len(row) >= 3:
-                value = float(row[2])
-                if value < min:
-                    min = value
-        return min
+def store_jobs():
+    """Un job (nome, anno, dataset, anno) per ogni anno dei dataset nello store."""
+    for dataset in store.datasets():
+        if 'land' in dataset:
+            continue  # Salta i dataset che contengono 'land'
+        for year in store.years(dataset):
+            yield dataset, year, year_statistics, (dataset, year)
 
-def calculate_max(file_path):
-    with open(file_path, mode='r') as file:
-        csv_reader = csv.reader(file)
-        next(csv_reader)  # Skip header if there is one
-        max = float('-inf')
-        for row in csv_reader:
-            if len(row) >= 3:
-                value = float(row[2])
-                if value > max:
-                    max = value
-        return max
-
-def calculate_std(file_path):
-    with open(file_path, mode='r') as file:
-        csv_reader = csv.reader(file)
-        next(csv_reader)  # Skip header if there is one
-        total = 0
-        count = 0
-        for row in csv_reader:
-            if len(row) >= 3:
-                total += float(row[2])
-                count += 1
-        average = total / count if count > 0 else 0
-        file.seek(0)
-        next(csv_reader)  # Skip header if there is one
-        total = 0
-        for row in csv_reader:
-            if len(row) >= 3:
-                total += (float(row[2]) - average) ** 2
-        return (total / count) ** 0.5
-
-def iterate_folders(base_path):
+def csv_jobs(base_path):
+    """Un job per ogni CSV esportato sotto base_path, come faceva la vecchia versione."""
     for root, dirs, files in os.walk(base_path):
         if 'land' in root:
             continue  # Salta le directory che contengono 'land'
-
-        year_list = []
-        min_list = []
-        max_list = []
-        mean_list = []
-        std_list = []
-
         for file in files:
-            if file.endswith('.csv'):
-                file_path = os.path.join(root, file)
+            if file.endswith('.csv') and file.split('.')[0].isdigit():
+                yield root, int(file.split('.')[0]), csv_statistics, (os.path.join(root, file),)
 
-                min_value = calculate_min(file_path)
-                max_value = calculate_max(file_path)
-                avg_value = calculate_average(file_path)
-                std_value = calculate_std(file_path)
-                # save in year file with only numbers
-                # Se c'è un modo per ottenere l'anno, aggiungilo a year_list
-                year_list.append(int(file.split('.')[0]))  # Esempio statico
+def _run(job):
+    name, year, function, args = job
+    return name, year, function(*args)
 
-                min_list.append(int(min_value))
-                max_list.append(int(max_value))
-                mean_list.append(int(avg_value))
-                std_list.append(int(std_value))
+def iterate_datasets(jobs, workers=None):
+    """Calcola le statistiche di tutti i file in parallelo, una sola lettura per file."""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_run, jobs))
 
-        sorted_data = sorted(zip(year_list, min_list, max_list, mean_list, std_list))
-        if sorted_data:  # Ensure data exists before unpacking
-            year_list, min_list, max_list, mean_list, std_list = zip(*sorted_data)
-        else:
-            year_list, min_list, max_list, mean_list, std_list = [], [], [], [], []
+    summary = {}
+    for name, year, stats in sorted(results, key=lambda result: result[:2]):
+        entry = summary.setdefault(name, {"year": []})
+        entry["year"].append(year)
+        for key, value in stats.items():
+            entry.setdefault(key, []).append(value)
+
+    for name, entry in summary.items():
         print(f"""
             <datatype>
-            name: {root}
-            year: {year_list}
-            min: {min_list}
-            max: {max_list}
-            mean: {mean_list}
-            std: {std_list}
+            name: {name}
+            year: {tuple(entry["year"])}
+            min: {tuple(int(value) for value in entry["min"])}
+            max: {tuple(int(value) for value in entry["max"])}
+            mean: {tuple(int(value) for value in entry["mean"])}
+            std: {tuple(int(value) for value in entry["std"])}
             </datatype>
         """)
 
+    return summary
+
 if __name__ == "__main__":
-    base_path = '.'
-    iterate_folders(base_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Statistiche per anno dei dataset")
+    parser.add_argument("--csv", metavar="FOLDER", help="leggi i CSV esportati invece dello store")
+    parser.add_argument("--json", type=Path, help="salva anche un riepilogo JSON per il prompt del chatbot")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    jobs = csv_jobs(args.csv) if args.csv else store_jobs()
+    summary = iterate_datasets(jobs, args.workers)
+
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2))
+        print(f"Riepilogo salvato: {args.json}")
@@ -0,0 +1,109 @@
+"""Motore di previsione vettoriale per le serie storiche dei pixel.
+
+Invece di filtrare il DataFrame e stimare un ARIMA di statsmodels per ogni pixel,
+tutti gli anni vengono impilati una sola volta in una matrice (pixel × anni) e i
+modelli ARIMA(p, d, 0) vengono stimati per tutti i pixel insieme, con i minimi
+quadrati condizionati risolti in batch.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from sahel.cube import RasterCube  # noqa: E402
+
+
+def load_matrix(source):
+    """Restituisce (pixel, anni, matrice pixel × anni) di un dataset.
+
+    `source` è il nome di un dataset dello store oppure un RasterCube già in memoria.
+    I pixel sono le celle valide del cubo in ordine di riga; gli anni mancanti per
+    un pixel restano NaN.
+    """
+    cube = source if isinstance(source, RasterCube) else RasterCube.from_store(source)
+    pixels = pd.DataFrame(cube.coords(), columns=["lon", "lat"])
+    matrix = cube.series().T.astype(np.float64)
+
+    return pixels, cube.years.tolist(), matrix
+
+
+def historical_mean(matrix):
+    """Media storica di ogni pixel, ignorando gli anni mancanti."""
+    with np.errstate(invalid="ignore"):
+        return np.nanmean(matrix, axis=1)
+
+
+def fit_ar(series, p):
+    """Stima un AR(p) senza costante per ogni riga di `series` in un'unica passata.
+
+    Restituisce (coefficienti pixel × p, maschera dei pixel con stima valida).
+    """
+    n_pixels, n = series.shape
+
+    # Matrice dei ritardi: lags[i, t, k] = series[i, t + p - 1 - k]
+    lags = np.stack([series[:, p - 1 - k:n - 1 - k] for k in range(p)], axis=2)
+    target = series[:, p:]
+
+    xtx = np.einsum("ntj,ntk->njk", lags, lags)
+    xty = np.einsum("ntj,nt->nj", lags, target)
+
+    # I pixel con sistema singolare (es. serie costante) non sono stimabili
+    with np.errstate(invalid="ignore", over="ignore", divide="ignore"):
+        cond = np.linalg.cond(xtx)
+    fitted = np.isfinite(cond) & (cond < 1e12)
+
+    xtx[~fitted] = np.eye(p)
+    xty[~fitted] = 0.0
+    coef = np.linalg.solve(xtx, xty[..., None])[..., 0]
+
+    return coef, fitted
+
+
+def forecast(matrix, order=(2, 1, 0), steps=1, min_obs=3):
+    """Prevede `steps` anni per ogni pixel con un ARIMA(p, d, 0) vettoriale.
+
+    Restituisce (previsioni pixel × steps, maschera `fitted`, maschera `enough`):
+    `enough` indica i pixel con almeno `min_obs` anni, `fitted` quelli per cui
+    il modello è stato stimato. Per gli altri le previsioni sono NaN e sta allo
+    script decidere se usare la media storica o saltarli.
+    """
+    p, d, _ = order
+    n_pixels = matrix.shape[0]
+
+    complete = ~np.isnan(matrix).any(axis=1)
+    enough = (~np.isnan(matrix)).sum(axis=1) >= min_obs
+
+    predictions = np.full((n_pixels, steps), np.nan)
+    fitted = np.zeros(n_pixels, dtype=bool)
+
+    # Con poche osservazioni riduciamo l'ordine, come farebbe un modello più semplice
+    n_diff = matrix.shape[1] - d
+    p = min(p, n_diff // 2)
+    rows = np.flatnonzero(complete & enough)
+    if p < 1 or len(rows) == 0:
+        return predictions, fitted, enough
+
+    values = matrix[rows]
+    series = np.diff(values, n=d, axis=1)
+    coef, ok = fit_ar(series, p)
+
+    # Ultimi valori di ogni ordine di differenza, per ricostruire i livelli
+    tails = [np.diff(values, n=k, axis=1)[:, -1] for k in range(d)]
+    lags = series[:, ::-1][:, :p].copy()
+
+    for step in range(steps):
+        value = np.einsum("nk,nk->n", coef, lags)
+        lags = np.concatenate([value[:, None], lags[:, :-1]], axis=1)
+        for k in reversed(range(d)):
+            tails[k] = tails[k] + value
+            value = tails[k]
+        predictions[rows, step] = value
+
+    ok &= np.isfinite(predictions[rows]).all(axis=1)
+    predictions[rows[~ok]] = np.nan
+    fitted[rows[ok]] = True
+
+    return predictions, fitted, enough
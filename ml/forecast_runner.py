@@ -0,0 +1,146 @@
+"""Esegue le previsioni per pixel in parallelo su più processi.
+
+La griglia dei pixel viene divisa in blocchi contigui; ogni blocco viene stimato in
+un processo separato che legge le serie e scrive le previsioni direttamente in
+memoria condivisa, senza serializzare DataFrame. I risultati vengono poi scritti
+nei CSV annuali sempre nello stesso ordine, quindi l'output è identico byte per
+byte qualunque sia il numero di processi.
+
+Esempio:
+    python ml/forecast_runner.py climate_precipitation --years 2028 --order 5 1 0 \
+        --min-obs 5 --workers 32 --output ml/climate_predictions/
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+from forecast import load_matrix, forecast, historical_mean
+
+# Stato di ogni processo, inizializzato una sola volta da `_attach`
+_shared = {}
+
+
+def _attach(matrix_spec, output_spec, order, min_obs):
+    """Collega il processo ai blocchi di memoria condivisa della matrice e dell'output."""
+    for key, (name, shape) in (("matrix", matrix_spec), ("output", output_spec)):
+        shm = shared_memory.SharedMemory(name=name)
+        _shared[key + "_shm"] = shm
+        _shared[key] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _shared["order"] = order
+    _shared["min_obs"] = min_obs
+
+
+def _run_chunk(start, stop):
+    """Stima il blocco di pixel [start, stop) e scrive previsioni e maschere nell'output."""
+    matrix = _shared["matrix"][start:stop]
+    output = _shared["output"]
+    steps = output.shape[1] - 2
+
+    predictions, fitted, enough = forecast(
+        matrix, order=_shared["order"], steps=steps, min_obs=_shared["min_obs"]
+    )
+    output[start:stop, :steps] = predictions
+    output[start:stop, steps] = fitted
+    output[start:stop, steps + 1] = enough
+
+    return start, stop
+
+
+def _create_shared(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=np.float64, buffer=shm.buf)
+    view[:] = array
+    return shm, view
+
+
+def run(matrix, order, steps, min_obs, workers=1, chunk_size=4096):
+    """Prevede tutti i pixel a blocchi e restituisce (previsioni, fitted, enough)."""
+    n_pixels = matrix.shape[0]
+    chunks = [
+        (start, min(start + chunk_size, n_pixels))
+        for start in range(0, n_pixels, chunk_size)
+    ]
+
+    matrix_shm, _ = _create_shared(np.ascontiguousarray(matrix, dtype=np.float64))
+    output_shm, output = _create_shared(np.zeros((n_pixels, steps + 2)))
+    initargs = (
+        (matrix_shm.name, matrix.shape),
+        (output_shm.name, output.shape),
+        order,
+        min_obs,
+    )
+
+    try:
+        if workers <= 1:
+            _attach(*initargs)
+            for chunk in chunks:
+                _run_chunk(*chunk)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_attach, initargs=initargs
+            ) as executor:
+                # Ogni blocco scrive nel proprio intervallo: l'ordine di arrivo non conta
+                for _ in executor.map(_run_chunk, *zip(*chunks)):
+                    pass
+
+        predictions = output[:, :steps].copy()
+        fitted = output[:, steps].astype(bool)
+        enough = output[:, steps + 1].astype(bool)
+    finally:
+        for key in ("matrix_shm", "output_shm"):
+            shm = _shared.pop(key, None)
+            if shm is not None:
+                shm.close()
+        _shared.clear()
+        for shm in (matrix_shm, output_shm):
+            shm.close()
+            shm.unlink()
+
+    return predictions, fitted, enough
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Previsioni ARIMA per pixel in parallelo")
+    parser.add_argument("dataset", help="dataset nello store, es. climate_precipitation")
+    parser.add_argument("--years", type=int, nargs="+", required=True, help="anni da prevedere")
+    parser.add_argument("--order", type=int, nargs=3, default=(2, 1, 0), metavar=("P", "D", "Q"))
+    parser.add_argument("--min-obs", type=int, default=3)
+    parser.add_argument("--fallback", choices=["mean", "skip"], default="mean",
+                        help="cosa fare per i pixel non stimabili")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--output", type=Path, required=True)
+    args = parser.parse_args()
+
+    pixels, years, matrix = load_matrix(args.dataset)
+    print(f"{len(pixels)} pixel, {len(years)} anni, {args.workers} processi")
+
+    predictions, fitted, enough = run(
+        matrix,
+        order=tuple(args.order),
+        steps=len(args.years),
+        min_obs=args.min_obs,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
+
+    if args.fallback == "mean":
+        predictions = np.where(fitted[:, None], predictions, historical_mean(matrix)[:, None])
+        keep = enough
+    else:
+        keep = fitted
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    for i, year in enumerate(args.years):
+        df_pred = pixels.assign(value=predictions[:, i])[keep]
+        df_pred.to_csv(args.output / f"{year}.csv", index=False)
+        print(f"Previsione per il {year} completata e salvata!")
+
+
+if __name__ == "__main__":
+    main()
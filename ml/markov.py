@@ -0,0 +1,113 @@
+"""Previsione vettoriale della copertura del suolo con catene di Markov.
+
+Le classi MODIS sono categorie, non quantità: invece di stimare un ARIMA sui codici
+e arrotondare il risultato, per ogni cella si stima una matrice di transizione tra
+classi contando i passaggi anno → anno osservati nel vicinato della cella, e la si
+applica in avanti alla distribuzione di probabilità della classe. La previsione di
+ogni anno è la classe più probabile, quindi sempre un codice valido.
+
+Tutti i conteggi sono fatti in una sola passata con `np.bincount` e le somme sul
+vicinato con le tabelle cumulative di `sahel.correlate`, senza cicli sui pixel.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from sahel.correlate import window_sums  # noqa: E402
+from sahel.cube import RasterCube  # noqa: E402
+
+
+def snap(values, classes):
+    """Porta ogni valore alla classe ammessa più vicina (a parità, la minore).
+
+    È un'unica ricerca binaria su tutto l'array; i NaN restano NaN.
+    """
+    classes = np.sort(np.asarray(classes, dtype=np.float64))
+    values = np.asarray(values, dtype=np.float64)
+    if len(classes) == 1:
+        return np.where(np.isnan(values), np.nan, classes[0])
+
+    upper = np.clip(np.searchsorted(classes, values), 1, len(classes) - 1)
+    low, high = classes[upper - 1], classes[upper]
+    snapped = np.where(values - low <= high - values, low, high)
+    return np.where(np.isnan(values), np.nan, snapped)
+
+
+def encode(dense, classes):
+    """Indice della classe di ogni cella in `classes` (ordinate), -1 dove manca il dato."""
+    dense = np.asarray(dense, dtype=np.float64)
+    index = np.clip(np.searchsorted(classes, dense), 0, len(classes) - 1)
+    known = ~np.isnan(dense) & (classes[index] == dense)
+    return np.where(known, index, -1).astype(np.int8)
+
+
+def transition_counts(states, k, radius=1):
+    """Conteggi delle transizioni per cella, sommati nel vicinato di raggio `radius`.
+
+    `states` è (anni, righe, colonne) di indici di classe in [0, k), -1 dove manca
+    il dato; il risultato è (righe, colonne, k, k), dove [r, c, i, j] conta i
+    passaggi dalla classe i alla classe j nella finestra attorno a (r, c).
+    """
+    _, rows, cols = states.shape
+
+    before, after = states[:-1], states[1:]
+    valid = (before >= 0) & (after >= 0)
+    cell = np.broadcast_to(np.arange(rows * cols).reshape(rows, cols), before.shape)
+    code = (cell * k + before) * k + after
+
+    counts = np.bincount(code[valid], minlength=rows * cols * k * k)
+    counts = counts.reshape(rows, cols, k * k).astype(np.float32)
+    if radius > 0:
+        counts = window_sums(counts, radius).astype(np.float32)
+    return counts.reshape(rows, cols, k, k)
+
+
+def transition_matrices(counts):
+    """Normalizza i conteggi per riga; le classi mai osservate restano ferme."""
+    totals = counts.sum(axis=-1, keepdims=True)
+    identity = np.eye(counts.shape[-1], dtype=np.float32)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(totals > 0, counts / totals, identity)
+
+
+def forecast_classes(source, steps, radius=1, classes=None):
+    """Prevede `steps` anni di copertura del suolo per ogni cella.
+
+    `source` è il nome di un dataset dello store oppure un RasterCube; `classes`
+    limita le classi ammesse (di default quelle osservate). Restituisce
+    (cubo degli anni previsti, probabilità della classe prevista (anni, righe, colonne)).
+    Le celle senza dato nell'ultimo anno restano vuote.
+    """
+    cube = source if isinstance(source, RasterCube) else RasterCube.from_store(source)
+    dense = cube.dense()
+
+    if classes is None:
+        classes = np.unique(dense[~np.isnan(dense)])
+    else:
+        # I codici fuori dall'elenco vengono prima portati alla classe più vicina
+        classes = np.sort(np.asarray(classes, dtype=np.float64))
+        dense = snap(dense, classes)
+    classes = np.asarray(classes, dtype=np.float64)
+
+    states = encode(dense, classes)
+    matrices = transition_matrices(transition_counts(states, len(classes), radius))
+
+    # Distribuzione iniziale: l'ultima classe osservata, con certezza
+    last = states[-1]
+    present = last >= 0
+    probability = np.zeros(last.shape + (len(classes),), dtype=np.float32)
+    probability[present, last[present]] = 1
+
+    predicted = np.full((steps,) + last.shape, np.nan, dtype=np.float32)
+    confidence = np.full((steps,) + last.shape, np.nan, dtype=np.float32)
+    for step in range(steps):
+        probability = np.einsum("rci,rcij->rcj", probability, matrices)
+        best = probability.argmax(axis=-1)
+        predicted[step][present] = classes[best[present]]
+        confidence[step][present] = np.take_along_axis(probability, best[..., None], axis=-1)[present, 0]
+
+    years = cube.years[-1] + np.arange(1, steps + 1)
+    return RasterCube.from_dense(cube.grid, years, predicted), confidence
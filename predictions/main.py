@@ -13,4 +13,5 @@ def clear_csv(directory: str):
     for f in files:
         os.remove(f)
 
-clear_csv('land_cover')
\ No newline at end of file
+if __name__ == "__main__":
+    clear_csv('land_cover')
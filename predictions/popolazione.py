@@ -1,51 +1,13 @@
 import os
-import rasterio
 import pandas as pd
 import numpy as np
-from affine import Affine
+import sys
+from pathlib import Path
 
-def read_tfw(tfw_file):
-    """Legge i parametri di trasformazione da un file TFW."""
-    with open(tfw_file, 'r') as f:
-        values = [float(line.strip()) for line in f.readlines()]
-    
-    # Creazione della trasformazione affine
-    transform = Affine(values[0], values[1], values[4], 
-                       values[2], values[3], values[5])
-    
-    return transform
+# La libreria di estrazione condivisa è nella radice del progetto
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from sahel import raster  # noqa: E402
 
-def extract_population_data(tiff_file, tfw_file=None):
-    """Estrae i dati di densità di popolazione da un file TIFF usando i parametri di un file TFW o direttamente dal TIFF."""
-
-    with rasterio.open(tiff_file) as src:
-        # Se il file TFW esiste, leggiamo la trasformazione da lì, altrimenti usiamo quella del TIFF
-        transform = read_tfw(tfw_file) if tfw_file and os.path.exists(tfw_file) else src.transform
-
-        # Leggi i dati raster
-        data = src.read(1)  # Prima banda (densità di popolazione)
-
-        # Verifica se c'è un valore NoData
-        nodata_value = src.nodata
-
-        # Ottieni la dimensione dell'immagine
-        rows, cols = np.indices(data.shape)
-
-        # Applica la trasformazione per ottenere le coordinate reali
-        xs, ys = rasterio.transform.xy(transform, rows, cols)
-
-        # Creazione del DataFrame
-        df = pd.DataFrame({
-            'lon': np.array(xs).flatten(),
-            'lat': np.array(ys).flatten(),
-            'value': data.flatten()
-        })
-
-        # Se c'è un valore NoData, rimuoviamo le righe corrispondenti
-        if nodata_value is not None:
-            df = df[df['value'] != nodata_value]
-
-        return df
 
 def process_population_data(input_folder, output_folder):
     """Elabora tutti i file di densità di popolazione e salva i CSV in cartelle per anno."""
@@ -65,12 +27,13 @@ def process_population_data(input_folder, output_folder):
             if os.path.exists(tiff_file):
                 print(f"Elaborazione: {tiff_file}")
 
-                df = extract_population_data(tiff_file, tfw_file)
+                df = raster.extract(tiff_file, tfw_file)
 
                 # Salva il CSV
                 csv_path = os.path.join(output_folder, f"{year}{resolution}.csv")
                 df.to_csv(csv_path, index=False)
                 print(f"Salvato: {csv_path}")
 
-input_folder = output_folder = "data/population_density"
-process_population_data(input_folder, output_folder)
+if __name__ == "__main__":
+    input_folder = output_folder = "data/population_density"
+    process_population_data(input_folder, output_folder)
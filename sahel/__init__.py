@@ -0,0 +1 @@
+"""Shared data layer for the Sahel visualizer, the ML scripts and the dataset tools."""
@@ -0,0 +1,119 @@
+"""Land-cover change detection between any two years.
+
+The history is kept as one ``uint8`` cube of class indices (``(years, rows, cols)``,
+one byte per cell and year, with ``len(classes)`` marking cells without data), so
+comparing two years is a single vectorized pass:
+
+- the changed-cell mask is an element-wise comparison of two layers;
+- the transition matrix is one ``np.bincount`` over ``from * (k + 1) + to``.
+
+The transition matrices of every pair of years are computed once per dataset
+version (one bincount per first year against all the others) and cached in memory
+and under ``dataset/store/.cache``.
+
+    history = ClassHistory.from_cube(RasterCube.from_store("land_cover"))
+    history.transitions(2010, 2023)   # (classes, classes) cell counts
+    history.changed(2010, 2023)       # (rows, cols) bool
+"""
+
+import hashlib
+import io
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+
+from sahel import store
+from sahel.cube import RasterCube
+from sahel.grid import GridSpec
+
+CACHE_FOLDER = store.STORE_FOLDER / ".cache" / "change"
+
+
+@dataclass(frozen=True)
+class ClassHistory:
+    grid: GridSpec
+    years: np.ndarray  # (years,) int32, sorted
+    classes: np.ndarray  # (classes,) class codes, sorted
+    states: np.ndarray  # (years, rows, cols) uint8 class index, len(classes) where no data
+
+    @classmethod
+    def from_cube(cls, cube: RasterCube) -> "ClassHistory":
+        dense = cube.dense()
+        classes = np.unique(dense[~np.isnan(dense)])
+        if len(classes) > 255:
+            raise ValueError(f"{len(classes)} classes do not fit in a uint8 history")
+
+        index = np.clip(np.searchsorted(classes, dense), 0, max(len(classes) - 1, 0))
+        known = ~np.isnan(dense)
+        states = np.where(known, index, len(classes)).astype(np.uint8)
+        return cls(cube.grid, cube.years, classes, states)
+
+    @property
+    def nodata(self) -> int:
+        return len(self.classes)
+
+    def layer(self, year: int) -> np.ndarray:
+        index = int(np.searchsorted(self.years, year))
+        if index >= len(self.years) or self.years[index] != year:
+            raise KeyError(f"No data for {year}")
+        return self.states[index]
+
+    def changed(self, first: int, second: int) -> np.ndarray:
+        """Cells with data in both years whose class differs."""
+        a, b = self.layer(first), self.layer(second)
+        return (a != b) & (a != self.nodata) & (b != self.nodata)
+
+    def transitions(self, first: int, second: int) -> np.ndarray:
+        """``(classes, classes)`` count of cells going from row class to column class."""
+        return self.table[self.year_position(first), self.year_position(second)]
+
+    def year_position(self, year: int) -> int:
+        return self.years.tolist().index(year)
+
+    @cached_property
+    def table(self) -> np.ndarray:
+        """The pairwise transitions of every pair of years, computed once and then read from disk."""
+        path = _cache_path(self)
+        if path.exists():
+            return np.load(path)
+
+        table = pairwise_transitions(self)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            buffer = io.BytesIO()
+            np.save(buffer, table)
+            store.atomic_write(path, buffer.getvalue())
+        except OSError:
+            pass  # read-only deployments recompute the table in every process
+        return table
+
+    def change_layer(self, first: int, second: int) -> np.ndarray:
+        """Class code of ``second`` where the class changed, -1 where it did not, NaN without data."""
+        a, b = self.layer(first), self.layer(second)
+        valid = (a != self.nodata) & (b != self.nodata)
+        codes = np.append(self.classes, np.nan).astype(np.float32)[b]
+        return np.where(valid, np.where(a != b, codes, -1), np.nan).astype(np.float32)
+
+
+def pairwise_transitions(history: ClassHistory) -> np.ndarray:
+    """``(years, years, classes, classes)`` transition counts of every pair of years."""
+    k = history.nodata + 1  # the nodata index is counted too, then dropped
+    n_years = len(history.years)
+    flat = history.states.reshape(n_years, -1).astype(np.int64)
+
+    table = np.empty((n_years, n_years, k - 1, k - 1), dtype=np.int64)
+    # Pair codes (second year, from, to) of one first year against every year at once
+    offsets = np.arange(n_years)[:, None] * k * k
+    for position, first in enumerate(flat):
+        codes = offsets + first * k + flat
+        counts = np.bincount(codes.reshape(-1), minlength=n_years * k * k)
+        table[position] = counts.reshape(n_years, k, k)[:, :-1, :-1]
+    return table
+
+
+def _cache_path(history: ClassHistory) -> Path:
+    digest = hashlib.blake2b(history.states.tobytes(), digest_size=12)
+    digest.update(history.years.tobytes() + history.classes.tobytes())
+    return CACHE_FOLDER / f"{digest.hexdigest()}.npy"
@@ -0,0 +1,101 @@
+"""Correlation between two aligned layers, globally and in moving windows.
+
+Both layers must be on the same grid (see `sahel.regrid`); cells where either is
+NaN or infinite are ignored (fill codes are NaN since ingestion, see `sahel.ingest`). Local correlations come from summed-area tables of the masked
+values, their squares and their product, so every window sum is four lookups and
+a full-grid map costs a handful of vectorized passes whatever the window size.
+"""
+
+import numpy as np
+
+# Windows with fewer valid cells than this are left NaN
+MIN_WINDOW_CELLS = 5
+
+
+def _valid_pairs(x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    both = np.isfinite(x) & np.isfinite(y)
+    return np.asarray(x[both], dtype=np.float64), np.asarray(y[both], dtype=np.float64)
+
+
+def _pearson(x: np.ndarray, y: np.ndarray) -> float:
+    if len(x) < 2:
+        return float("nan")
+    dx, dy = x - x.mean(), y - y.mean()
+    denominator = np.sqrt((dx**2).sum() * (dy**2).sum())
+    return float((dx * dy).sum() / denominator) if denominator > 0 else float("nan")
+
+
+def rank(values: np.ndarray) -> np.ndarray:
+    """Ranks starting at 1, with ties given their average rank."""
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    # The tied values of class k occupy ranks end[k] - counts[k] + 1 ... end[k]
+    end = np.cumsum(counts)
+    return (end - (counts - 1) / 2)[inverse]
+
+
+def pearson(x: np.ndarray, y: np.ndarray) -> float:
+    return _pearson(*_valid_pairs(x, y))
+
+
+def spearman(x: np.ndarray, y: np.ndarray) -> float:
+    x, y = _valid_pairs(x, y)
+    return _pearson(rank(x), rank(y))
+
+
+def summary(x: np.ndarray, y: np.ndarray) -> dict[str, float]:
+    x, y = _valid_pairs(x, y)
+    return {
+        "cells": len(x),
+        "pearson": _pearson(x, y),
+        "spearman": _pearson(rank(x), rank(y)),
+    }
+
+
+def summed_area(values: np.ndarray) -> np.ndarray:
+    """Summed-area table over the first two axes, with a leading row and column of zeros."""
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1) + values.shape[2:])
+    np.cumsum(np.cumsum(values, axis=0), axis=1, out=table[1:, 1:])
+    return table
+
+
+def window_sums(values: np.ndarray, radius: int) -> np.ndarray:
+    """Sum over the ``(2 * radius + 1)²`` window around every cell, clipped at the edges.
+
+    Trailing axes beyond the first two are summed independently.
+    """
+    table = summed_area(values)
+    rows, cols = values.shape[:2]
+    top = np.clip(np.arange(rows) - radius, 0, rows)
+    bottom = np.clip(np.arange(rows) + radius + 1, 0, rows)
+    left = np.clip(np.arange(cols) - radius, 0, cols)
+    right = np.clip(np.arange(cols) + radius + 1, 0, cols)
+
+    strips = table[bottom] - table[top]
+    return strips[:, right] - strips[:, left]
+
+
+def local_correlation(
+    x: np.ndarray, y: np.ndarray, radius: int, min_cells: int = MIN_WINDOW_CELLS
+) -> np.ndarray:
+    """Pearson coefficient in a moving window around every cell where both layers have data."""
+    both = np.isfinite(x) & np.isfinite(y)
+    x = np.where(both, x, 0).astype(np.float64)
+    y = np.where(both, y, 0).astype(np.float64)
+    # Centring on the global means keeps the sums of squares well conditioned
+    if both.any():
+        x = np.where(both, x - x[both].mean(), 0)
+        y = np.where(both, y - y[both].mean(), 0)
+
+    n = window_sums(both.astype(np.float64), radius)
+    sx, sy = window_sums(x, radius), window_sums(y, radius)
+    sxx, syy, sxy = window_sums(x * x, radius), window_sums(y * y, radius), window_sums(x * y, radius)
+
+    covariance = n * sxy - sx * sy
+    variance = (n * sxx - sx**2) * (n * syy - sy**2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = covariance / np.sqrt(variance)
+
+    # Windows with no spread in either layer have no defined coefficient
+    scale = np.maximum(n * sxx, 1e-300) * np.maximum(n * syy, 1e-300)
+    defined = both & (n >= min_cells) & (variance > 1e-12 * scale)
+    return np.where(defined, np.clip(r, -1, 1), np.nan).astype(np.float32)
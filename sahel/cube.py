@@ -0,0 +1,146 @@
+"""Dense in-memory raster cubes.
+
+A `RasterCube` keeps a dataset as one ``(years, rows, cols)`` array on its regular
+grid, instead of a long table where every cell repeats its float64 lon/lat next to
+the value for every year. Values use the smallest dtype that holds them exactly
+(land cover fits in ``uint8``), coordinates come from the grid's affine transform,
+and a single mask marks the cells that have data in at least one year.
+
+    cube = RasterCube.from_store("land_cover")
+    cube.layer(2020)          # (rows, cols) float32, NaN outside the data
+    cube.series()             # (years, pixels) of the masked cells
+    cube.to_frame(2020)       # the classic lon, lat, value table
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sahel import store
+from sahel.grid import GridSpec, to_dense
+
+# Integer dtypes tried in order; the largest value of each is kept free as nodata
+INTEGER_DTYPES = (np.uint8, np.int16, np.uint16, np.int32)
+
+
+def compact_dtype(values: np.ndarray) -> tuple[np.dtype, float]:
+    """Smallest dtype holding the non-NaN values exactly, and its nodata marker."""
+    valid = values[~np.isnan(values)]
+    if len(valid) and np.array_equal(valid, np.round(valid)):
+        low, high = valid.min(), valid.max()
+        for dtype in INTEGER_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high < info.max:
+                return np.dtype(dtype), float(info.max)
+    return np.dtype(np.float32), np.nan
+
+
+@dataclass(frozen=True)
+class RasterCube:
+    grid: GridSpec
+    years: np.ndarray  # (years,) int32, sorted
+    values: np.ndarray  # (years, rows, cols), nodata where a cell has no value
+    nodata: float  # NaN for float cubes
+    mask: np.ndarray  # (rows, cols) cells with data in at least one year
+
+    @classmethod
+    def from_dense(cls, grid: GridSpec, years, dense: np.ndarray) -> "RasterCube":
+        """Build a cube from a float ``(years, rows, cols)`` array with NaN as nodata."""
+        years = np.asarray(years, dtype=np.int32)
+        order = np.argsort(years)
+        dense = np.asarray(dense)[order]
+
+        missing = np.isnan(dense)
+        dtype, nodata = compact_dtype(dense)
+        values = np.where(missing, nodata, dense).astype(dtype)
+        return cls(grid, years[order], values, nodata, ~missing.all(axis=0))
+
+    @classmethod
+    def from_pixels(
+        cls, years, coords: np.ndarray, values: np.ndarray, grid: GridSpec | None = None
+    ) -> "RasterCube":
+        """Build a cube from per-pixel coordinates and ``(years, pixels)`` values."""
+        coords = np.asarray(coords, dtype=np.float64)
+        grid = grid or GridSpec.from_coords(coords)
+        return cls.from_dense(grid, years, to_dense(grid, coords, np.asarray(values)))
+
+    @classmethod
+    def from_store(cls, dataset: str) -> "RasterCube":
+        cube = store.load_cube(dataset)
+        return cls.from_pixels(cube.years, cube.coords, cube.values)
+
+    @classmethod
+    def from_frames(cls, frames: dict[int, pd.DataFrame], column: str = "value") -> "RasterCube":
+        """Build a cube from per-year ``lon, lat, value`` tables, e.g. the CSV exports."""
+        coords = np.concatenate([df[["lon", "lat"]].to_numpy(np.float64) for df in frames.values()])
+        grid = GridSpec.from_coords(coords)
+
+        dense = np.full((len(frames),) + grid.shape, np.nan, dtype=np.float32)
+        for layer, df in zip(dense, frames.values()):
+            row, col = grid.index(df["lon"].to_numpy(), df["lat"].to_numpy())
+            layer[row, col] = df[column].to_numpy()
+        return cls.from_dense(grid, list(frames), dense)
+
+    @classmethod
+    def from_csv(cls, folder: Path) -> "RasterCube":
+        """Read every ``<year>.csv`` of a folder."""
+        files = sorted(file for file in Path(folder).glob("*.csv") if file.stem.isdigit())
+        return cls.from_frames({int(file.stem): pd.read_csv(file) for file in files})
+
+    @property
+    def transform(self) -> tuple[float, float, float, float, float, float]:
+        return self.grid.transform
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.mask.nbytes + self.years.nbytes
+
+    def year_index(self, year: int) -> int:
+        index = int(np.searchsorted(self.years, year))
+        if index >= len(self.years) or self.years[index] != year:
+            raise KeyError(f"No data for {year}")
+        return index
+
+    def _as_float(self, values: np.ndarray) -> np.ndarray:
+        if np.isnan(self.nodata):
+            return values.astype(np.float32, copy=False)
+        return np.where(values == self.nodata, np.nan, values).astype(np.float32)
+
+    def layer(self, year: int) -> np.ndarray:
+        """One year as a ``(rows, cols)`` float32 array, NaN where there is no data."""
+        return self._as_float(self.values[self.year_index(year)])
+
+    def dense(self) -> np.ndarray:
+        """Every year as a float32 ``(years, rows, cols)`` array with NaN as nodata."""
+        return self._as_float(self.values)
+
+    def cells(self) -> tuple[np.ndarray, np.ndarray]:
+        """Row and column of every masked cell, in row-major order."""
+        return np.nonzero(self.mask)
+
+    def coords(self) -> np.ndarray:
+        """``(pixels, 2)`` lon/lat centres of the masked cells."""
+        rows, cols = self.cells()
+        lon, lat = self.grid.centers()
+        return np.column_stack([lon[cols], lat[rows]])
+
+    def series(self) -> np.ndarray:
+        """``(years, pixels)`` float32 values of the masked cells, NaN where missing."""
+        rows, cols = self.cells()
+        return self._as_float(self.values[:, rows, cols])
+
+    def to_frame(self, year: int) -> pd.DataFrame:
+        """One year in the classic ``lon, lat, value`` layout."""
+        layer = self.layer(year)
+        rows, cols = np.nonzero(~np.isnan(layer))
+        lon, lat = self.grid.centers()
+        return pd.DataFrame({"lon": lon[cols], "lat": lat[rows], "value": layer[rows, cols]})
+
+    def to_csv(self, folder: Path) -> None:
+        """Write one ``<year>.csv`` per year."""
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        for year in self.years.tolist():
+            self.to_frame(year).to_csv(folder / f"{year}.csv", index=False)
@@ -0,0 +1,156 @@
+"""Distance-to-infrastructure layers from the road and stream networks.
+
+The line networks under ``dataset/original/Streamwater_Line_Road_Network`` are
+burned onto a grid by sampling every segment at least twice per cell, then an
+exact Euclidean distance transform gives the distance in km from every cell to
+the nearest burned one. The transform is separable: a cumulative pass finds the
+nearest line cell along each column, and a second, chunked broadcast pass takes
+the minimum over each row, so there is no loop over vertices or cells.
+
+Roads run far beyond the Assaba grids, so lines are burned on the grid widened
+on every side, starting with MARGIN_KM. A line outside the margin is farther than
+the margin from every cell, so once the largest distance in the grid is within it
+the result is exact; otherwise the margin is widened to that distance and the
+transform repeated. The layers are stored as ordinary single-year datasets on the
+finest dataset grid, ready to be compared on the Correlate page:
+
+    python -m sahel.distance
+"""
+
+import argparse
+import math
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from sahel import store
+from sahel.grid import GridSpec
+from sahel.shapes import edges, read_shapefile
+
+NETWORK_FOLDER = (
+    Path(__file__).resolve().parent.parent / "dataset" / "original" / "Streamwater_Line_Road_Network"
+)
+NETWORKS = {"distance_road": "Main_Road", "distance_water": "Streamwater"}
+# The networks have no time dimension; they are stored under their survey year
+NETWORK_YEAR = 2025
+# The finest dataset grid, onto which the stored layers are computed
+GRID_DATASET = "land_cover"
+# First margin around the grid, widened as far as the distances require
+MARGIN_KM = 25
+KM_PER_DEGREE = 111.32
+# Rows per chunk of the second pass, which holds a (rows, cols, cols) block
+ROW_CHUNK = 16
+
+
+def cell_size_km(grid: GridSpec) -> tuple[float, float]:
+    """Width and height of the cells in km, at the grid's central latitude."""
+    west, south, east, north = grid.bounds
+    latitude = math.radians((south + north) / 2)
+    return grid.xres * KM_PER_DEGREE * math.cos(latitude), grid.yres * KM_PER_DEGREE
+
+
+def burn_lines(lines: list[list[np.ndarray]], grid: GridSpec) -> np.ndarray:
+    """Mark the cells crossed by any of the lines."""
+    x0, y0, x1, y1 = np.concatenate([edges(parts) for parts in lines if parts]).T
+
+    # At least two samples per cell crossed, so no cell along a segment is skipped
+    cells = np.maximum(np.abs(x1 - x0) / grid.xres, np.abs(y1 - y0) / grid.yres)
+    samples = np.ceil(cells * 2).astype(np.int64) + 1
+    segment = np.repeat(np.arange(len(x0)), samples)
+    step = np.arange(samples.sum()) - np.repeat(np.cumsum(samples) - samples, samples)
+    t = step / (samples[segment] - 1)
+
+    row, col = grid.index(x0[segment] + t * (x1 - x0)[segment], y0[segment] + t * (y1 - y0)[segment])
+    inside = grid.contains(row, col)
+    mask = np.zeros(grid.shape, dtype=bool)
+    mask[row[inside], col[inside]] = True
+    return mask
+
+
+def _column_distance(mask: np.ndarray) -> np.ndarray:
+    """Distance in cells to the nearest True cell of the same column, inf if none."""
+    index = np.arange(mask.shape[0], dtype=np.float64)[:, None]
+    above = np.maximum.accumulate(np.where(mask, index, -np.inf), axis=0)
+    below = np.minimum.accumulate(np.where(mask, index, np.inf)[::-1], axis=0)[::-1]
+    return np.minimum(index - above, below - index)
+
+
+def distance_transform(mask: np.ndarray, xres: float = 1.0, yres: float = 1.0) -> np.ndarray:
+    """Exact Euclidean distance from every cell to the nearest True cell.
+
+    ``xres`` and ``yres`` are the cell width and height; cells are inf when the mask
+    is empty. The broadcast pass runs along the shorter axis.
+    """
+    if mask.shape[1] > mask.shape[0]:
+        return distance_transform(mask.T, yres, xres).T
+
+    vertical = (_column_distance(mask) * yres) ** 2
+    # horizontal[c, c'] is the squared distance between columns c and c'
+    horizontal = (np.abs(np.arange(mask.shape[1])[:, None] - np.arange(mask.shape[1])) * xres) ** 2
+
+    squared = np.empty(mask.shape)
+    for start in range(0, mask.shape[0], ROW_CHUNK):
+        block = vertical[start:start + ROW_CHUNK]
+        squared[start:start + ROW_CHUNK] = (block[:, None, :] + horizontal[None]).min(axis=2)
+    return np.sqrt(squared)
+
+
+def _read_network(network: str) -> list[list[np.ndarray]]:
+    return [shape.parts for shape in read_shapefile(NETWORK_FOLDER / NETWORKS[network])]
+
+
+def _widen(grid: GridSpec, margin: int) -> GridSpec:
+    return GridSpec(
+        west=grid.west - margin * grid.xres,
+        north=grid.north + margin * grid.yres,
+        xres=grid.xres,
+        yres=grid.yres,
+        rows=grid.rows + 2 * margin,
+        cols=grid.cols + 2 * margin,
+    )
+
+
+@lru_cache(maxsize=8)
+def distance_layer(network: str, grid: GridSpec) -> np.ndarray:
+    """Distance in km from every cell of a grid to the nearest line of a network."""
+    lines = _read_network(network)
+    x_km, y_km = cell_size_km(grid)
+    margin_km = MARGIN_KM
+    while True:
+        margin = math.ceil(margin_km / min(x_km, y_km))
+        mask = burn_lines(lines, _widen(grid, margin))
+        distance = distance_transform(mask, x_km, y_km)[margin:-margin, margin:-margin]
+        farthest = float(distance.max())
+        if farthest <= margin_km:
+            return distance.astype(np.float32)
+        # A line within the farthest distance may lie outside the margin; with no line
+        # burned at all, keep doubling until one is
+        margin_km = farthest if math.isfinite(farthest) else 2 * margin_km
+
+
+def build(networks: list[str] | None = None, grid_dataset: str = GRID_DATASET) -> None:
+    """Store the distance layers on the cells of a dataset."""
+    cube = store.load_cube(grid_dataset)
+    coords = np.asarray(cube.coords)
+    grid = GridSpec.from_coords(coords)
+    row, col = grid.index(coords[:, 0], coords[:, 1])
+
+    for network in networks or NETWORKS:
+        values = distance_layer(network, grid)[row, col]
+        store.save(network, np.array([NETWORK_YEAR]), coords, values[None])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the distance-to-infrastructure datasets")
+    parser.add_argument("--network", action="append", choices=sorted(NETWORKS), help="only these layers")
+    parser.add_argument("--grid", default=GRID_DATASET, help="dataset whose cells the layers cover")
+    args = parser.parse_args()
+
+    build(args.network, args.grid)
+    for network in args.network or NETWORKS:
+        print(f"Saved {network} on the {args.grid} grid")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""On-demand exports of one dataset year, clipped to a bounding box or a district.
+
+An export is written once, chunk by chunk, into a file under
+``dataset/store/.cache/export`` named after the hash of everything that determines
+its bytes (the dataset's content fingerprint, the year, the clip and the format),
+so repeated requests read the finished file back. The folder is kept under
+CACHE_BYTES by dropping the least recently used files. A caller that serves the
+files itself (the app, from its static folder) passes its own folder instead.
+
+    path = export(ExportRequest("population_density", 2020, "csv.gz", zone=("districts", "Kiffa")))
+
+CSV, gzip-compressed CSV and GeoTIFF are written with the standard library and
+NumPy; Parquet needs pyarrow and is only offered when it is installed.
+"""
+
+import gzip
+import hashlib
+import importlib.util
+import os
+import struct
+import tempfile
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+import pandas as pd
+
+from sahel import store, zonal
+from sahel.grid import GridSpec
+
+CACHE_FOLDER = store.STORE_FOLDER / ".cache" / "export"
+# Override with the SAHEL_EXPORT_CACHE_BYTES environment variable
+CACHE_BYTES = int(os.environ.get("SAHEL_EXPORT_CACHE_BYTES", 256 * 1024 * 1024))
+# Bump to invalidate the cached exports when a writer changes
+CACHE_VERSION = 1
+# Rows per CSV chunk and Parquet row group, and bytes per GeoTIFF strip
+CHUNK_ROWS = 100_000
+STRIP_BYTES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    label: str
+    extension: str
+    mime: str
+
+
+FORMATS = {
+    "csv": ExportFormat("CSV", "csv", "text/csv"),
+    "csv.gz": ExportFormat("CSV (gzip)", "csv.gz", "application/gzip"),
+    "parquet": ExportFormat("Parquet", "parquet", "application/vnd.apache.parquet"),
+    "tif": ExportFormat("GeoTIFF", "tif", "image/tiff"),
+}
+
+
+def available_formats() -> dict[str, ExportFormat]:
+    if importlib.util.find_spec("pyarrow") is None:
+        return {key: value for key, value in FORMATS.items() if key != "parquet"}
+    return FORMATS
+
+
+@dataclass(frozen=True)
+class ExportRequest:
+    dataset: str
+    year: int
+    format: str
+    bounds: tuple[float, float, float, float] | None = None  # (west, south, east, north)
+    zone: tuple[str, str] | None = None  # (layer, zone name)
+
+    @property
+    def file_name(self) -> str:
+        clip = f"-{self.zone[1]}" if self.zone else "-clip" if self.bounds else ""
+        return f"{self.dataset}-{self.year}{clip}.{FORMATS[self.format].extension}"
+
+    @property
+    def mime(self) -> str:
+        return FORMATS[self.format].mime
+
+
+@lru_cache(maxsize=32)
+def _fingerprint(dataset: str, mtime_ns: int) -> str:
+    return store.fingerprint(dataset)
+
+
+def cache_key(request: ExportRequest) -> str:
+    mtime = (store.STORE_FOLDER / request.dataset / "values.npy").stat().st_mtime_ns
+    key = (CACHE_VERSION, _fingerprint(request.dataset, mtime), request)
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+def select(request: ExportRequest) -> tuple[GridSpec, np.ndarray, np.ndarray]:
+    """The dataset grid, the ``(cells, 2)`` lon/lat and the values of the selected cells."""
+    cube = store.load_cube(request.dataset)
+    index = int(np.searchsorted(cube.years, request.year))
+    if index >= len(cube.years) or cube.years[index] != request.year:
+        raise KeyError(f"{request.dataset} has no data for {request.year}")
+
+    coords = np.asarray(cube.coords)
+    values = np.asarray(cube.values[index])
+    keep = ~np.isnan(values)
+    if request.bounds is not None:
+        west, south, east, north = request.bounds
+        keep &= (coords[:, 0] >= west) & (coords[:, 0] <= east)
+        keep &= (coords[:, 1] >= south) & (coords[:, 1] <= north)
+
+    grid = GridSpec.from_coords(coords)
+    if request.zone is not None:
+        layer, name = request.zone
+        row, col = grid.index(coords[:, 0], coords[:, 1])
+        label = zonal.zone_names(layer).index(name) + 1
+        keep &= zonal.zone_labels(layer, grid)[row, col] == label
+    return grid, coords[keep], values[keep]
+
+
+def write_csv(out: BinaryIO, coords: np.ndarray, values: np.ndarray) -> None:
+    """The ``lon, lat, value`` table of `store.export_csv`, formatted a chunk at a time."""
+    for start in range(0, max(len(values), 1), CHUNK_ROWS):
+        chunk = slice(start, start + CHUNK_ROWS)
+        frame = pd.DataFrame({"lon": coords[chunk, 0], "lat": coords[chunk, 1], "value": values[chunk]})
+        out.write(frame.to_csv(index=False, header=start == 0).encode())
+
+
+def write_parquet(out: BinaryIO, coords: np.ndarray, values: np.ndarray) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("lon", pa.float64()), ("lat", pa.float64()), ("value", pa.float32())])
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for start in range(0, max(len(values), 1), CHUNK_ROWS):
+            chunk = slice(start, start + CHUNK_ROWS)
+            writer.write_batch(
+                pa.record_batch([coords[chunk, 0], coords[chunk, 1], values[chunk]], schema=schema)
+            )
+
+
+def write_geotiff(out: BinaryIO, grid: GridSpec, coords: np.ndarray, values: np.ndarray) -> None:
+    """A float32 GeoTIFF (EPSG:4326, NaN nodata) of the smallest window holding the cells.
+
+    Deflate-compressed strips are written as they are encoded; the directory goes
+    last and the header is patched to point at it.
+    """
+    row, col = grid.index(coords[:, 0], coords[:, 1])
+    if len(values):
+        top, left = int(row.min()), int(col.min())
+        rows, cols = int(row.max()) - top + 1, int(col.max()) - left + 1
+    else:
+        top, left, rows, cols = 0, 0, 1, 1
+    raster = np.full((rows, cols), np.nan, dtype="<f4")
+    raster[row - top, col - left] = values
+
+    start = out.tell()
+    out.write(b"II*\x00\x00\x00\x00\x00")
+    rows_per_strip = max(1, STRIP_BYTES // (cols * 4))
+    offsets, counts = [], []
+    for first in range(0, rows, rows_per_strip):
+        strip = zlib.compress(raster[first:first + rows_per_strip].tobytes(), 6)
+        offsets.append(out.tell() - start)
+        counts.append(len(strip))
+        out.write(strip)
+    if (out.tell() - start) % 2:
+        out.write(b"\x00")  # the directory starts on a word boundary
+
+    west, north = grid.west + left * grid.xres, grid.north - top * grid.yres
+    geokeys = [1, 1, 0, 3, 1024, 0, 1, 2, 1025, 0, 1, 1, 2048, 0, 1, 4326]
+    # (tag, type, values): types 3 SHORT, 4 LONG, 12 DOUBLE, 2 ASCII
+    tags = [
+        (256, 4, [cols]),
+        (257, 4, [rows]),
+        (258, 3, [32]),
+        (259, 3, [8]),  # Deflate
+        (262, 3, [1]),  # BlackIsZero
+        (273, 4, offsets),
+        (277, 3, [1]),
+        (278, 4, [rows_per_strip]),
+        (279, 4, counts),
+        (284, 3, [1]),
+        (339, 3, [3]),  # IEEE float samples
+        (33550, 12, [grid.xres, grid.yres, 0.0]),
+        (33922, 12, [0.0, 0.0, 0.0, west, north, 0.0]),
+        (34735, 3, geokeys),
+        (42113, 2, b"nan\x00"),  # GDAL_NODATA
+    ]
+    formats = {2: "s", 3: "H", 4: "I", 12: "d"}
+
+    directory = out.tell() - start
+    extra = directory + 2 + 12 * len(tags) + 4
+    entries, payload = [], b""
+    for tag, kind, data in tags:
+        count = len(data)
+        packed = data if kind == 2 else struct.pack(f"<{count}{formats[kind]}", *data)
+        if len(packed) <= 4:
+            entries.append(struct.pack("<HHI", tag, kind, count) + packed.ljust(4, b"\x00"))
+        else:
+            entries.append(struct.pack("<HHII", tag, kind, count, extra + len(payload)))
+            payload += packed + b"\x00" * (len(packed) % 2)
+    out.write(struct.pack("<H", len(tags)) + b"".join(entries) + struct.pack("<I", 0) + payload)
+
+    end = out.tell()
+    out.seek(start + 4)
+    out.write(struct.pack("<I", directory))
+    out.seek(end)
+
+
+def _write(request: ExportRequest, out: BinaryIO) -> None:
+    grid, coords, values = select(request)
+    if request.format == "csv":
+        write_csv(out, coords, values)
+    elif request.format == "csv.gz":
+        with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6, mtime=0) as compressed:
+            write_csv(compressed, coords, values)
+    elif request.format == "parquet":
+        write_parquet(out, coords, values)
+    elif request.format == "tif":
+        write_geotiff(out, grid, coords, values)
+    else:
+        raise ValueError(f"Unknown export format {request.format!r}")
+
+
+def _trim_cache(folder: Path, keep: Path) -> None:
+    files = []
+    for path in folder.glob("*.export"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue  # trimmed by another session meanwhile
+        files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= CACHE_BYTES:
+            break
+        if path != keep:
+            total -= size
+            path.unlink(missing_ok=True)
+
+
+def _cache_folder() -> Path:
+    try:
+        CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
+        return CACHE_FOLDER
+    except OSError:
+        # Read-only deployments keep their exports in the temporary folder instead
+        folder = Path(tempfile.gettempdir()) / "sahel-export"
+        folder.mkdir(exist_ok=True)
+        return folder
+
+
+def export(request: ExportRequest, folder: Path | None = None) -> Path:
+    """The path of the finished export, written on the first request and then reused."""
+    if folder is None:
+        folder = _cache_folder()
+    else:
+        folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"{cache_key(request)}.export"
+    if path.exists():
+        os.utime(path)  # most recently used
+        return path
+
+    with tempfile.NamedTemporaryFile(dir=folder, prefix=".", delete=False) as tmp:
+        try:
+            _write(request, tmp)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+    os.replace(tmp.name, path)
+    _trim_cache(folder, path)
+    return path
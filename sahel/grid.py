@@ -0,0 +1,123 @@
+"""Regular lon/lat grid geometry of the stored datasets."""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from sahel.store import COORD_TOLERANCE
+
+
+def _resolution(centres: np.ndarray) -> float:
+    # Steps below the store's tolerance are float noise on the same cell
+    steps = np.diff(centres)
+    steps = steps[steps > COORD_TOLERANCE]
+    return float(steps.min()) if len(steps) else 1.0
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    """A north-up regular grid: ``west``/``north`` are the outer edges of cell (0, 0)."""
+
+    west: float
+    north: float
+    xres: float
+    yres: float
+    rows: int
+    cols: int
+
+    @classmethod
+    def from_coords(cls, coords: np.ndarray) -> "GridSpec":
+        """Infer the grid from cell-centre coordinates, as stored in ``coords.npy``."""
+        xs, ys = np.unique(coords[:, 0]), np.unique(coords[:, 1])
+        xres, yres = _resolution(xs), _resolution(ys)
+
+        return cls(
+            west=float(coords[:, 0].min()) - xres / 2,
+            north=float(coords[:, 1].max()) + yres / 2,
+            xres=xres,
+            yres=yres,
+            rows=int(round((ys[-1] - ys[0]) / yres)) + 1,
+            cols=int(round((xs[-1] - xs[0]) / xres)) + 1,
+        )
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.rows, self.cols
+
+    @property
+    def transform(self) -> tuple[float, float, float, float, float, float]:
+        """Affine coefficients ``(a, b, c, d, e, f)`` in rasterio/affine order."""
+        return (self.xres, 0.0, self.west, 0.0, -self.yres, self.north)
+
+    @property
+    def bounds(self) -> tuple[float, float, float, float]:
+        """``(west, south, east, north)``."""
+        return (
+            self.west,
+            self.north - self.rows * self.yres,
+            self.west + self.cols * self.xres,
+            self.north,
+        )
+
+    def index(self, lon, lat) -> tuple[np.ndarray, np.ndarray]:
+        """Row and column of the cells containing the given points (inverse transform)."""
+        col = np.floor((np.asarray(lon) - self.west) / self.xres).astype(np.int64)
+        row = np.floor((self.north - np.asarray(lat)) / self.yres).astype(np.int64)
+        return row, col
+
+    def contains(self, row: np.ndarray, col: np.ndarray) -> np.ndarray:
+        return (row >= 0) & (row < self.rows) & (col >= 0) & (col < self.cols)
+
+    def centers(self) -> tuple[np.ndarray, np.ndarray]:
+        """Cell-centre longitudes (per column) and latitudes (per row)."""
+        lon = self.west + (np.arange(self.cols) + 0.5) * self.xres
+        lat = self.north - (np.arange(self.rows) + 0.5) * self.yres
+        return lon, lat
+
+    def coarsen(self, factor: int) -> "GridSpec":
+        return GridSpec(
+            west=self.west,
+            north=self.north,
+            xres=self.xres * factor,
+            yres=self.yres * factor,
+            rows=-(-self.rows // factor),
+            cols=-(-self.cols // factor),
+        )
+
+
+def to_dense(grid: GridSpec, coords: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Scatter per-pixel values (``(..., pixels)``) onto the dense grid, NaN elsewhere."""
+    row, col = grid.index(coords[:, 0], coords[:, 1])
+    dense = np.full(values.shape[:-1] + grid.shape, np.nan, dtype=np.float32)
+    dense[..., row, col] = values
+    return dense
+
+
+def block_reduce(dense: np.ndarray, factor: int, categorical: bool = False) -> np.ndarray:
+    """Aggregate ``factor × factor`` blocks of the last two axes.
+
+    Continuous values are averaged over the valid cells of each block; categorical
+    values keep the top-left valid cell instead, so no invented classes appear.
+    """
+    rows, cols = dense.shape[-2:]
+    pad_rows, pad_cols = -rows % factor, -cols % factor
+    padded = np.pad(
+        dense,
+        [(0, 0)] * (dense.ndim - 2) + [(0, pad_rows), (0, pad_cols)],
+        constant_values=np.nan,
+    )
+    block_rows, block_cols = padded.shape[-2] // factor, padded.shape[-1] // factor
+    blocks = padded.reshape(padded.shape[:-2] + (block_rows, factor, block_cols, factor))
+    blocks = np.swapaxes(blocks, -3, -2).reshape(
+        padded.shape[:-2] + (block_rows, block_cols, factor * factor)
+    )
+    valid = ~np.isnan(blocks)
+
+    if categorical:
+        first = np.argmax(valid, axis=-1)
+        return np.take_along_axis(blocks, first[..., None], axis=-1)[..., 0]
+
+    count = valid.sum(axis=-1)
+    total = np.where(valid, blocks, 0).sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan).astype(dense.dtype)
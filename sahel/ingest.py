@@ -0,0 +1,243 @@
+"""Incremental ingestion of the original rasters into the store.
+
+Every ``.tif`` under ``dataset/original/`` that matches a known dataset is
+fingerprinted together with its ``.tfw`` world file. The manifest next to the store
+remembers the sizes and content hash of each one, and is only rewritten when the
+store changes, so it stays the same across checkouts. The mtimes seen when a file
+was last hashed are kept apart, in the local cache, so a run only converts rasters
+that are new or changed:
+
+- files whose size and mtime are unchanged are skipped without being read;
+- files with the same sizes and content hash (touched, or a fresh checkout) are
+  only re-stamped in the cache;
+- everything else is extracted in a process pool and written into the store,
+  and the overview pyramid of every updated dataset is rebuilt.
+
+    python -m sahel.ingest [--workers N] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sahel import pyramid, store
+
+ORIGINAL_FOLDER = Path(__file__).resolve().parent.parent / "dataset" / "original"
+MANIFEST_FILE = store.STORE_FOLDER / "ingest.json"
+STAMPS_FILE = store.STORE_FOLDER / ".cache" / "ingest_stamps.json"
+# MODIS products code their unfilled pixels (water, clouds, no retrieval) from 32761 up
+MODIS_FILL_FROM = 32761
+
+
+@dataclass(frozen=True)
+class Source:
+    folder: str
+    pattern: str  # the first group is the year
+    categorical: bool = False  # class codes, never averaged
+    fill_from: float | None = None  # values from this one up are fill codes, not data
+
+
+SOURCES = {
+    "climate_precipitation": Source("Climate_Precipitation_Data", r"(\d{4})R\.tif"),
+    "gross_primary": Source(
+        "MODIS_Gross_Primary_Production_GPP", r"(\d{4})_GP\.tif", fill_from=MODIS_FILL_FROM
+    ),
+    "land_cover": Source("Modis_Land_Cover_Data", r"(\d{4})LCT\.tif", categorical=True),
+    "population_density": Source("Gridded_Population_Density_Data", r"Assaba_Pop_(\d{4})\.tif"),
+}
+
+
+@dataclass(frozen=True)
+class Raster:
+    dataset: str
+    year: int
+    tiff: Path
+    tfw: Path | None
+
+    @property
+    def files(self) -> list[Path]:
+        return [self.tiff] + ([self.tfw] if self.tfw else [])
+
+    @property
+    def key(self) -> str:
+        return self.tiff.relative_to(self.tiff.parents[1]).as_posix()
+
+
+def scan(original: Path = ORIGINAL_FOLDER, datasets: list[str] | None = None) -> list[Raster]:
+    rasters = []
+    for dataset, source in SOURCES.items():
+        if datasets and dataset not in datasets:
+            continue
+        folder = original / source.folder
+        if not folder.is_dir():
+            continue
+        for tiff in sorted(folder.iterdir()):
+            match = re.fullmatch(source.pattern, tiff.name)
+            if match:
+                tfw = tiff.with_suffix(".tfw")
+                rasters.append(Raster(dataset, int(match[1]), tiff, tfw if tfw.exists() else None))
+    return rasters
+
+
+def file_stamps(raster: Raster) -> list[list[int]]:
+    """Size and mtime of each file: cheap to read, and enough to detect most edits."""
+    return [[stat.st_size, stat.st_mtime_ns] for stat in (path.stat() for path in raster.files)]
+
+
+def file_sizes(stamps: list[list[int]]) -> list[int]:
+    return [size for size, _ in stamps]
+
+
+def content_hash(raster: Raster) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for path in raster.files:
+        with open(path, "rb") as file:
+            digest.update(hashlib.file_digest(file, "blake2b").digest())
+    return digest.hexdigest()
+
+
+def load_manifest() -> dict:
+    return json.loads(MANIFEST_FILE.read_text()) if MANIFEST_FILE.exists() else {}
+
+
+def _save_manifest(manifest: dict) -> None:
+    store.atomic_write(MANIFEST_FILE, json.dumps(manifest, indent=1, sort_keys=True).encode())
+
+
+def load_stamps() -> dict:
+    return json.loads(STAMPS_FILE.read_text()) if STAMPS_FILE.exists() else {}
+
+
+def _save_stamps(stamps: dict) -> None:
+    try:
+        STAMPS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        store.atomic_write(STAMPS_FILE, json.dumps(stamps, sort_keys=True).encode())
+    except OSError:
+        pass  # without the stamps, the next run hashes the rasters again
+
+
+def _stored_years(dataset: str) -> set[int]:
+    try:
+        return set(store.years(dataset))
+    except FileNotFoundError:
+        return set()
+
+
+def plan(
+    rasters: list[Raster], manifest: dict, stamps: dict, force: bool = False
+) -> tuple[list[Raster], dict, dict]:
+    """Split rasters into those to convert and the manifest entries and stamps of the rest."""
+    stored = {dataset: _stored_years(dataset) for dataset in {r.dataset for r in rasters}}
+    changed, unchanged, current = [], {}, {}
+
+    for raster in rasters:
+        entry = manifest.get(raster.key)
+        present = raster.year in stored[raster.dataset]
+        if force or entry is None or not present or entry["dataset"] != raster.dataset:
+            changed.append(raster)
+            continue
+
+        seen = file_stamps(raster)
+        if entry["sizes"] != file_sizes(seen):
+            changed.append(raster)
+        elif stamps.get(raster.key) == seen or entry["hash"] == content_hash(raster):
+            unchanged[raster.key] = entry
+            current[raster.key] = seen
+        else:
+            changed.append(raster)
+
+    return changed, unchanged, current
+
+
+def mask_fill(values: np.ndarray, fill_from: float | None) -> np.ndarray:
+    """The values with the fill codes at or above ``fill_from`` turned into NaN."""
+    if fill_from is None:
+        return values
+    return np.where(values >= fill_from, np.nan, values)
+
+
+def convert(raster: Raster) -> tuple[Raster, np.ndarray, np.ndarray, dict, list[list[int]]]:
+    """Extract one raster; runs in a worker process."""
+    from sahel import raster as reader
+
+    df = reader.extract(raster.tiff, raster.tfw)
+    seen = file_stamps(raster)
+    entry = {
+        "dataset": raster.dataset,
+        "year": raster.year,
+        "sizes": file_sizes(seen),
+        "hash": content_hash(raster),
+    }
+    # Fill codes stay in the store as cells without data, never as values
+    values = mask_fill(df["value"].to_numpy(), SOURCES[raster.dataset].fill_from)
+    return raster, df[["lon", "lat"]].to_numpy(), values, entry, seen
+
+
+def ingest(
+    original: Path = ORIGINAL_FOLDER,
+    datasets: list[str] | None = None,
+    workers: int | None = None,
+    force: bool = False,
+) -> dict[str, list[int]]:
+    """Bring the store up to date with the original rasters; return the years written."""
+    previous, previous_stamps = load_manifest(), load_stamps()
+    changed, unchanged, seen = plan(scan(original, datasets), previous, previous_stamps, force)
+
+    # Entries of rasters outside this run (other datasets, deleted files) are kept as is
+    manifest = {**previous, **unchanged}
+    stamps = {**previous_stamps, **seen}
+    if not changed:
+        if stamps != previous_stamps:
+            _save_stamps(stamps)
+        return {}
+
+    if workers == 1 or len(changed) == 1:
+        results = [convert(raster) for raster in changed]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(convert, changed))
+
+    frames: dict[str, dict[int, pd.DataFrame]] = {}
+    for raster, coords, values, entry, raster_stamps in results:
+        frames.setdefault(raster.dataset, {})[raster.year] = pd.DataFrame(
+            {"lon": coords[:, 0], "lat": coords[:, 1], "value": values}
+        )
+        manifest[raster.key] = entry
+        stamps[raster.key] = raster_stamps
+
+    for dataset, years in frames.items():
+        store.write_years(dataset, years)
+        # Build the overviews now rather than on the first map request
+        pyramid.load_pyramid(dataset, SOURCES[dataset].categorical)
+    # The manifest is only updated once the store holds the new data
+    _save_manifest(manifest)
+    _save_stamps(stamps)
+
+    return {dataset: sorted(years) for dataset, years in frames.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert new or changed rasters into the store")
+    parser.add_argument("--original", type=Path, default=ORIGINAL_FOLDER, help="folder of the original data")
+    parser.add_argument("--dataset", action="append", choices=sorted(SOURCES), help="only these datasets")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--force", action="store_true", help="convert every raster again")
+    args = parser.parse_args()
+
+    written = ingest(args.original, args.dataset, args.workers, args.force)
+    if not written:
+        print("Store is up to date")
+    for dataset, years in written.items():
+        print(f"Ingested {dataset}: {', '.join(map(str, years))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Point queries: the whole history of the pixel under a lon/lat position.
+
+The store keeps one coordinate per pixel, and every dataset is a regular grid, so
+a query needs no search: the inverse affine transform gives the cell, and a
+``(rows, cols)`` table built once per dataset gives the pixel stored there. The
+pixel's values for every year are then one contiguous row of ``series.npy``
+(written on first use, see `store.load_series`).
+
+    pixel_history("population_density", -11.4, 16.6)
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from sahel import store
+from sahel.grid import GridSpec
+
+
+@dataclass(frozen=True)
+class PointIndex:
+    grid: GridSpec
+    pixels: np.ndarray  # (rows, cols) int32, stored pixel of every cell or -1
+
+    @classmethod
+    def from_coords(cls, coords: np.ndarray) -> "PointIndex":
+        coords = np.asarray(coords, dtype=np.float64)
+        grid = GridSpec.from_coords(coords)
+        row, col = grid.index(coords[:, 0], coords[:, 1])
+
+        pixels = np.full(grid.shape, -1, dtype=np.int32)
+        pixels[row, col] = np.arange(len(coords), dtype=np.int32)
+        return cls(grid, pixels)
+
+    def lookup(self, lon, lat) -> np.ndarray:
+        """Stored pixel containing each point, or -1 outside the data."""
+        row, col = self.grid.index(np.atleast_1d(lon), np.atleast_1d(lat))
+        inside = self.grid.contains(row, col)
+
+        result = np.full(row.shape, -1, dtype=np.int32)
+        result[inside] = self.pixels[row[inside], col[inside]]
+        return result
+
+
+def stamp(dataset: str) -> int:
+    """Changes whenever the dataset does, since years.npy is written last."""
+    return (store.STORE_FOLDER / dataset / "years.npy").stat().st_mtime_ns
+
+
+def point_index(dataset: str) -> PointIndex:
+    """The index of a dataset, built from its coordinates; callers keep it as long as they need."""
+    return PointIndex.from_coords(store.load_cube(dataset).coords)
+
+
+def pixel_history(
+    dataset: str, lon: float, lat: float, index: Callable[[str], PointIndex] = point_index
+) -> pd.Series | None:
+    """Value of the pixel under a point for every year, or None outside the data."""
+    pixel = int(index(dataset).lookup(lon, lat)[0])
+    if pixel < 0:
+        return None
+
+    values = np.array(store.load_series(dataset)[pixel])
+    return pd.Series(values, index=pd.Index(store.years(dataset), name="year"), name=dataset)
+
+
+def pixel_center(
+    dataset: str, lon: float, lat: float, index: Callable[[str], PointIndex] = point_index
+) -> tuple[float, float] | None:
+    """Centre of the stored pixel under a point, or None outside the data."""
+    pixel = int(index(dataset).lookup(lon, lat)[0])
+    if pixel < 0:
+        return None
+    lon, lat = store.load_cube(dataset).coords[pixel]
+    return float(lon), float(lat)
+
+
+def inspect(
+    datasets: list[str], lon: float, lat: float, index: Callable[[str], PointIndex] = point_index
+) -> pd.DataFrame:
+    """Histories of several datasets at one point, one column per dataset with data there.
+
+    ``index`` returns the point index of a dataset, e.g. from the caller's cache.
+    """
+    histories = [pixel_history(dataset, lon, lat, index) for dataset in datasets]
+    histories = [history for history in histories if history is not None]
+    if not histories:
+        return pd.DataFrame(index=pd.Index([], name="year"))
+    return pd.concat(histories, axis=1).sort_index().dropna(axis=1, how="all")
@@ -0,0 +1,157 @@
+"""Resolution pyramids of the stored datasets.
+
+Level 0 is the stored grid; every next level halves the resolution by reducing
+2 × 2 blocks of the previous one (mean of the valid cells, or the first valid
+class for categorical data, like GDAL's average and nearest overviews) until the
+grid is at most MIN_SIDE cells on its longer side. The reduced levels are built
+once per version of a dataset and cached under ``dataset/store/.cache``.
+
+A viewer asks for the coarsest level that still resolves its screen pixels and
+reads only the window it shows:
+
+    pyramid = load_pyramid("land_cover", categorical=True)
+    level = pyramid.choose(0.01, bounds, budget=20_000)
+    grid, layer = pyramid.window(level, 2020, bounds)
+"""
+
+import hashlib
+import io
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from sahel import store
+from sahel.cube import RasterCube
+from sahel.grid import GridSpec, block_reduce
+
+MIN_SIDE = 64
+# Windows are widened to multiples of this many cells, so nearby views share them
+WINDOW_ALIGN = 32
+CACHE_FOLDER = store.STORE_FOLDER / ".cache" / "pyramid"
+# Bump to invalidate the levels cached on disk when the reduction changes
+CACHE_VERSION = 1
+
+
+@dataclass(frozen=True)
+class Pyramid:
+    levels: tuple[RasterCube, ...]  # level k has cells 2**k times larger than level 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.nbytes for level in self.levels)
+
+    def _window(self, level: int, bounds: tuple[float, float, float, float] | None) -> tuple[slice, slice]:
+        grid = self.levels[level].grid
+        if bounds is None:
+            return slice(0, grid.rows), slice(0, grid.cols)
+
+        west, south, east, north = bounds
+        (top, bottom), (left, right) = grid.index([west, east], [north, south])
+
+        def widen(start: int, stop: int, size: int) -> slice:
+            start = min(max(int(start) // WINDOW_ALIGN * WINDOW_ALIGN, 0), size)
+            stop = min(-(-(int(stop) + 1) // WINDOW_ALIGN) * WINDOW_ALIGN, size)
+            return slice(start, max(stop, start))
+
+        return widen(top, bottom, grid.rows), widen(left, right, grid.cols)
+
+    def cells(self, level: int, bounds: tuple[float, float, float, float] | None = None) -> int:
+        """Cells with data of a level inside the window around ``bounds``."""
+        rows, cols = self._window(level, bounds)
+        return int(self.levels[level].mask[rows, cols].sum())
+
+    def choose(
+        self,
+        resolution: float,
+        bounds: tuple[float, float, float, float] | None = None,
+        budget: int | None = None,
+    ) -> int:
+        """Coarsest level with cells no larger than ``resolution`` degrees.
+
+        When the window around ``bounds`` would hold more than ``budget`` cells with
+        data, coarser levels are taken until it fits (or the top is reached).
+        """
+        level = 0
+        while level + 1 < len(self.levels) and self.levels[level + 1].grid.xres <= resolution:
+            level += 1
+        while budget is not None and level + 1 < len(self.levels) and self.cells(level, bounds) > budget:
+            level += 1
+        return level
+
+    def window(
+        self, level: int, year: int, bounds: tuple[float, float, float, float] | None = None
+    ) -> tuple[GridSpec, np.ndarray]:
+        """The grid and float32 values of one year of a level around ``bounds``."""
+        cube = self.levels[level]
+        rows, cols = self._window(level, bounds)
+        grid = cube.grid
+        window = GridSpec(
+            west=grid.west + cols.start * grid.xres,
+            north=grid.north - rows.start * grid.yres,
+            xres=grid.xres,
+            yres=grid.yres,
+            rows=int(rows.stop - rows.start),
+            cols=int(cols.stop - cols.start),
+        )
+        values = cube.values[cube.year_index(year), rows, cols]
+        if np.isnan(cube.nodata):
+            return window, values.astype(np.float32)
+        return window, np.where(values == cube.nodata, np.nan, values).astype(np.float32)
+
+
+def build_pyramid(cube: RasterCube, categorical: bool = False) -> Pyramid:
+    levels = [cube]
+    while max(levels[-1].grid.shape) > MIN_SIDE:
+        previous = levels[-1]
+        reduced = block_reduce(previous.dense(), 2, categorical=categorical)
+        levels.append(RasterCube.from_dense(previous.grid.coarsen(2), previous.years, reduced))
+    return Pyramid(tuple(levels))
+
+
+def _cache_path(dataset: str, categorical: bool) -> Path:
+    stat = (store.STORE_FOLDER / dataset / "values.npy").stat()
+    key = repr((CACHE_VERSION, dataset, categorical, stat.st_size, stat.st_mtime_ns)).encode()
+    return CACHE_FOLDER / f"{hashlib.blake2b(key, digest_size=12).hexdigest()}.npz"
+
+
+def _read_levels(path: Path, base: RasterCube) -> Pyramid:
+    levels = [base]
+    with np.load(path) as arrays:
+        for level in range(1, int(arrays["levels"]) + 1):
+            levels.append(
+                RasterCube(
+                    levels[-1].grid.coarsen(2),
+                    base.years,
+                    arrays[f"values_{level}"],
+                    float(arrays[f"nodata_{level}"]),
+                    arrays[f"mask_{level}"],
+                )
+            )
+    return Pyramid(tuple(levels))
+
+
+def _load_pyramid(dataset: str, categorical: bool, path: Path) -> Pyramid:
+    base = RasterCube.from_store(dataset)
+    if path.exists():
+        return _read_levels(path, base)
+
+    pyramid = build_pyramid(base, categorical)
+    arrays = {"levels": len(pyramid.levels) - 1}
+    for level, cube in enumerate(pyramid.levels[1:], start=1):
+        arrays.update(
+            {f"values_{level}": cube.values, f"nodata_{level}": cube.nodata, f"mask_{level}": cube.mask}
+        )
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        store.atomic_write(path, buffer.getvalue())
+    except OSError:
+        pass  # read-only deployments rebuild the levels in every process
+    return pyramid
+
+
+def load_pyramid(dataset: str, categorical: bool = False) -> Pyramid:
+    """The pyramid of a stored dataset, built on first use and then read from disk."""
+    return _load_pyramid(dataset, categorical, _cache_path(dataset, categorical))
@@ -0,0 +1,104 @@
+"""GeoTIFF to lon/lat/value extraction shared by every ingestion script.
+
+Rasters are read in full-width strips of whole blocks, so memory stays bounded by
+`WINDOW_PIXELS` whatever the size of the file, and pixels come out in the same
+row-major order as a full read. Coordinates are computed from the affine transform
+only for the valid pixels of each strip:
+
+    lon = a * (col + 0.5) + b * (row + 0.5) + c
+    lat = d * (col + 0.5) + e * (row + 0.5) + f
+
+Projected rasters (the MODIS products are in sinusoidal metres) are warped on the
+fly to a regular WGS84 grid, with nearest-neighbour resampling so class codes
+survive unchanged.
+"""
+
+import os
+from collections.abc import Iterator
+from contextlib import ExitStack
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import rasterio
+from affine import Affine
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+
+WINDOW_PIXELS = 1 << 22
+GEOGRAPHIC_CRS = "EPSG:4326"
+
+
+def read_tfw(tfw_file: str | Path) -> Affine:
+    """Read the six transform parameters of a TFW world file."""
+    with open(tfw_file) as f:
+        a, d, b, e, c, f_ = (float(line) for line in f.read().split()[:6])
+    # The world file references the centre of the top-left pixel, Affine its corner
+    return Affine(a, b, c, d, e, f_) * Affine.translation(-0.5, -0.5)
+
+
+def raster_transform(src, tfw_file: str | Path | None = None) -> Affine:
+    """The transform of the world file if there is one, otherwise the TIFF's own."""
+    if tfw_file and os.path.exists(tfw_file):
+        return read_tfw(tfw_file)
+    return src.transform
+
+
+def strips(src, max_pixels: int = WINDOW_PIXELS) -> Iterator[Window]:
+    """Full-width windows covering the raster top to bottom, aligned to its blocks."""
+    block_rows = src.block_shapes[0][0]
+    rows = max(block_rows, max_pixels // max(src.width, 1) // block_rows * block_rows)
+    for top in range(0, src.height, rows):
+        yield Window(0, top, src.width, min(rows, src.height - top))
+
+
+def valid_mask(data: np.ndarray, nodata: float | None) -> np.ndarray:
+    if nodata is None:
+        return np.ones(data.shape, dtype=bool)
+    if np.isnan(nodata):
+        return ~np.isnan(data)
+    return data != nodata
+
+
+def iter_pixels(
+    tiff_file: str | Path,
+    tfw_file: str | Path | None = None,
+    band: int = 1,
+    max_pixels: int = WINDOW_PIXELS,
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield ``(lon, lat, value)`` arrays of the valid pixels, one strip at a time."""
+    with ExitStack() as stack:
+        src = stack.enter_context(rasterio.open(tiff_file))
+        if src.crs is not None and not src.crs.is_geographic:
+            # The world file of a projected raster is in metres too, so it is not used
+            reader = stack.enter_context(
+                WarpedVRT(src, crs=GEOGRAPHIC_CRS, resampling=Resampling.nearest)
+            )
+            transform = reader.transform
+        else:
+            reader = src
+            transform = raster_transform(src, tfw_file)
+        a, b, c, d, e, f, *_ = transform
+        nodata = reader.nodata
+
+        for window in strips(reader, max_pixels):
+            data = reader.read(band, window=window)
+            rows, cols = np.nonzero(valid_mask(data, nodata))
+
+            x = cols + 0.5
+            y = rows + (window.row_off + 0.5)
+            yield a * x + b * y + c, d * x + e * y + f, data[rows, cols]
+
+
+def extract(
+    tiff_file: str | Path,
+    tfw_file: str | Path | None = None,
+    column: str = "value",
+    band: int = 1,
+    max_pixels: int = WINDOW_PIXELS,
+) -> pd.DataFrame:
+    """Read the valid pixels of one band into a ``lon``, ``lat``, `column` DataFrame."""
+    parts = list(iter_pixels(tiff_file, tfw_file, band, max_pixels))
+    lon, lat, values = (np.concatenate(arrays) for arrays in zip(*parts))
+    return pd.DataFrame({"lon": lon, "lat": lat, column: values})
@@ -0,0 +1,183 @@
+"""Resampling between the dataset grids through cached sparse weight maps.
+
+The datasets sit on different regular grids (precipitation at 0.05°, population
+at 1 km, the MODIS products at ~500 m). For a pair of grids and a method, a
+`RegridMap` lists once which source cells feed every target cell and with what
+weight; aligning a year is then a single sparse matrix–vector product:
+
+    target = (W @ (x * valid)) / (W @ valid)
+
+The normalization by the weights of the valid source cells makes NaN cells drop
+out instead of spreading. Methods:
+
+- ``nearest``: the source cell containing the target centre (for class codes);
+- ``bilinear``: the four source centres around the target centre;
+- ``area``: every source cell, weighted by its overlap with the target cell.
+
+The grids are axis-aligned, so each map is the outer product of one weight list
+per axis. Maps are cached on disk under ``dataset/store/.cache``; callers that
+reuse them across calls keep them in their own cache and pass it as ``maps``.
+"""
+
+import hashlib
+import io
+from collections.abc import Callable
+from dataclasses import astuple, dataclass
+from pathlib import Path
+
+import numpy as np
+
+from sahel import store
+from sahel.grid import GridSpec
+
+METHODS = ("nearest", "bilinear", "area")
+CACHE_FOLDER = store.STORE_FOLDER / ".cache" / "regrid"
+# Bump to invalidate the maps cached on disk when the construction changes
+CACHE_VERSION = 2
+# Overlaps below this fraction of a source cell are float noise of edges that coincide
+OVERLAP_TOLERANCE = 1e-9
+
+
+@dataclass(frozen=True)
+class RegridMap:
+    source: GridSpec
+    target: GridSpec
+    method: str
+    target_index: np.ndarray  # flat target cell of every entry
+    source_index: np.ndarray  # flat source cell of every entry
+    weights: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.target_index.nbytes + self.source_index.nbytes + self.weights.nbytes
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        """Resample a ``(rows, cols)`` source layer, NaN as nodata, onto the target grid."""
+        x = np.asarray(values, dtype=np.float64).reshape(-1)[self.source_index]
+        valid = ~np.isnan(x)
+
+        cells = self.target.rows * self.target.cols
+        index, weights = self.target_index[valid], self.weights[valid]
+        total = np.bincount(index, weights=weights * x[valid], minlength=cells)
+        weight = np.bincount(index, weights=weights, minlength=cells)
+
+        result = np.full(cells, np.nan, dtype=np.float32)
+        covered = weight > 0
+        result[covered] = total[covered] / weight[covered]
+        return result.reshape(self.target.shape)
+
+
+def _axis_weights(
+    method: str, target_start: float, target_step: float, target_n: int,
+    source_start: float, source_step: float, source_n: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """One axis of a map: (target index, source index, weight) for every pair.
+
+    Positions are measured along the axis in the direction of increasing index.
+    """
+    target = np.arange(target_n)
+    # Target cell centres and edges in source-cell units
+    centre = (target_start + (target + 0.5) * target_step - source_start) / source_step
+
+    if method == "nearest":
+        pairs = [(target, np.floor(centre).astype(np.int64), np.ones(target_n))]
+    elif method == "bilinear":
+        low = np.floor(centre - 0.5).astype(np.int64)
+        fraction = centre - 0.5 - low
+        pairs = [(target, low, 1 - fraction), (target, low + 1, fraction)]
+    elif method == "area":
+        start = (target_start + target * target_step - source_start) / source_step
+        stop = start + target_step / source_step
+        first = np.floor(start).astype(np.int64)
+        span = int(np.ceil(target_step / source_step)) + 1
+        pairs = []
+        for offset in range(span):
+            source = first + offset
+            overlap = np.minimum(stop, source + 1) - np.maximum(start, source)
+            pairs.append((target, source, np.where(overlap > OVERLAP_TOLERANCE, overlap, 0)))
+    else:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+
+    target_index, source_index, weights = (np.concatenate(parts) for parts in zip(*pairs))
+    keep = (source_index >= 0) & (source_index < source_n) & (weights > 0)
+    return target_index[keep], source_index[keep], weights[keep]
+
+
+def build_map(source: GridSpec, target: GridSpec, method: str) -> RegridMap:
+    rows = _axis_weights(
+        method, -target.north, target.yres, target.rows, -source.north, source.yres, source.rows
+    )
+    cols = _axis_weights(
+        method, target.west, target.xres, target.cols, source.west, source.xres, source.cols
+    )
+
+    # Every (row pair, column pair) combination is one entry of the 2-D map
+    target_index = (rows[0][:, None] * target.cols + cols[0][None, :]).reshape(-1)
+    source_index = (rows[1][:, None] * source.cols + cols[1][None, :]).reshape(-1)
+    weights = (rows[2][:, None] * cols[2][None, :]).reshape(-1)
+
+    order = np.argsort(target_index, kind="stable")
+    return RegridMap(
+        source, target, method,
+        target_index[order].astype(np.int32),
+        source_index[order].astype(np.int32),
+        weights[order].astype(np.float32),
+    )
+
+
+def _cache_path(source: GridSpec, target: GridSpec, method: str) -> Path:
+    key = repr((CACHE_VERSION, astuple(source), astuple(target), method)).encode()
+    return CACHE_FOLDER / f"{hashlib.blake2b(key, digest_size=12).hexdigest()}.npz"
+
+
+def regrid_map(source: GridSpec, target: GridSpec, method: str = "bilinear") -> RegridMap:
+    """The map between two grids, built once and then read back from the disk cache."""
+    path = _cache_path(source, target, method)
+    if path.exists():
+        with np.load(path) as arrays:
+            return RegridMap(
+                source, target, method,
+                arrays["target_index"], arrays["source_index"], arrays["weights"],
+            )
+
+    regrid = build_map(source, target, method)
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        target_index=regrid.target_index,
+        source_index=regrid.source_index,
+        weights=regrid.weights,
+    )
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        store.atomic_write(path, buffer.getvalue())
+    except OSError:
+        pass  # read-only deployments rebuild the map in every process
+    return regrid
+
+
+def default_method(source: GridSpec, target: GridSpec, categorical: bool = False) -> str:
+    """Nearest for class codes, area when coarsening, bilinear when refining."""
+    if categorical:
+        return "nearest"
+    return "area" if source.xres * source.yres < target.xres * target.yres else "bilinear"
+
+
+def coarser(first: GridSpec, second: GridSpec) -> GridSpec:
+    """The grid with the larger cells, onto which a pair is compared."""
+    return first if first.xres * first.yres >= second.xres * second.yres else second
+
+
+def regrid(
+    values: np.ndarray,
+    source: GridSpec,
+    target: GridSpec,
+    method: str | None = None,
+    categorical: bool = False,
+    maps: Callable[[GridSpec, GridSpec, str], RegridMap] = regrid_map,
+) -> np.ndarray:
+    """Resample a ``(rows, cols)`` layer from one grid onto another."""
+    if source == target:
+        return np.asarray(values, dtype=np.float32)
+    method = method or default_method(source, target, categorical)
+    return maps(source, target, method).apply(values)
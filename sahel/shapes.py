@@ -0,0 +1,91 @@
+"""Minimal reader for the ESRI shapefiles shipped with the data.
+
+Only what the admin, road and river layers need: polygon and polyline geometry
+(Z/M variants are read as 2-D) and the attribute table. Every shape is a list of
+``(points, 2)`` lon/lat arrays, one per ring or line part.
+"""
+
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+NULL_SHAPE = 0
+XY_SHAPES = {3, 5, 13, 15, 23, 25}  # polyline and polygon, plain, Z and M
+
+
+@dataclass(frozen=True)
+class Shape:
+    parts: list[np.ndarray]
+    record: dict
+
+
+def _read_geometry(data: bytes) -> list[list[np.ndarray]]:
+    shapes = []
+    offset = 100  # fixed-size file header
+    while offset < len(data):
+        # Record header: number and content length in 16-bit words, both big-endian
+        _, length = struct.unpack_from(">2i", data, offset)
+        content = offset + 8
+        offset = content + 2 * length
+
+        (shape_type,) = struct.unpack_from("<i", data, content)
+        if shape_type == NULL_SHAPE:
+            shapes.append([])
+            continue
+        if shape_type not in XY_SHAPES:
+            raise ValueError(f"Unsupported shape type {shape_type}")
+
+        # Bounding box (4 doubles) precedes the part and point counts
+        n_parts, n_points = struct.unpack_from("<2i", data, content + 36)
+        starts = np.frombuffer(data, "<i4", n_parts, content + 44)
+        points = np.frombuffer(data, "<f8", 2 * n_points, content + 44 + 4 * n_parts)
+        points = points.reshape(-1, 2)
+        shapes.append(np.split(points, starts[1:]))
+    return shapes
+
+
+def _read_records(data: bytes, encoding: str) -> list[dict]:
+    n_records, header_length, record_length = struct.unpack_from("<IHH", data, 4)
+
+    fields = []
+    for offset in range(32, header_length - 1, 32):
+        name = data[offset:offset + 11].split(b"\0")[0].decode("ascii")
+        kind = chr(data[offset + 11])
+        size, decimals = data[offset + 16], data[offset + 17]
+        fields.append((name, kind, size, decimals))
+
+    records = []
+    for index in range(n_records):
+        start = header_length + index * record_length + 1  # skip the deletion flag
+        record = {}
+        for name, kind, size, decimals in fields:
+            raw = data[start:start + size].decode(encoding, errors="replace").strip()
+            start += size
+            if kind in "NF" and raw:
+                record[name] = float(raw) if decimals or kind == "F" else int(raw)
+            elif kind in "NF":
+                record[name] = None
+            else:
+                record[name] = raw
+        records.append(record)
+    return records
+
+
+def read_shapefile(path: str | Path) -> list[Shape]:
+    """Read ``<path>.shp`` and its ``.dbf`` attribute table (``.cpg`` gives the encoding)."""
+    path = Path(path).with_suffix("")
+    cpg = path.with_suffix(".cpg")
+    encoding = cpg.read_text().strip() if cpg.exists() else "latin-1"
+
+    geometry = _read_geometry(path.with_suffix(".shp").read_bytes())
+    records = _read_records(path.with_suffix(".dbf").read_bytes(), encoding)
+    return [Shape(parts, record) for parts, record in zip(geometry, records)]
+
+
+def edges(parts: list[np.ndarray]) -> np.ndarray:
+    """Every segment of the given parts as an ``(edges, 4)`` array of x0, y0, x1, y1."""
+    return np.concatenate(
+        [np.column_stack([part[:-1], part[1:]]) for part in parts if len(part) > 1]
+    )
@@ -0,0 +1,139 @@
+"""Summary statistics for the gridded datasets.
+
+Each year is loaded whole (one row of ``values.npy``, at most a few million
+float64 values) so that the percentiles are exact; min, max, mean, std and count
+come from the same array.
+
+The per-year aggregates and histograms of every dataset are also kept in a compact
+index next to the data, which the app loads once at startup:
+
+    python -m sahel.stats
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sahel import store
+from sahel.cube import RasterCube
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+INDEX_FILE = store.STORE_FOLDER / "statistics.json"
+HISTOGRAM_BINS = 32
+
+
+def summarize(values: np.ndarray) -> dict[str, float]:
+    """Statistics of one whole year of values, NaN as nodata; std is the population one."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        summary = {"count": 0, "min": np.inf, "max": -np.inf, "mean": 0.0, "std": 0.0}
+        quantiles = [np.nan] * len(PERCENTILES)
+    else:
+        summary = {
+            "count": len(values),
+            "min": values.min(),
+            "max": values.max(),
+            "mean": values.mean(),
+            "std": values.std(),
+        }
+        quantiles = np.percentile(values, PERCENTILES)
+    summary.update({f"p{p}": float(q) for p, q in zip(PERCENTILES, quantiles)})
+    return {key: float(value) for key, value in summary.items()}
+
+
+def _cube(source: str | RasterCube) -> RasterCube:
+    return source if isinstance(source, RasterCube) else RasterCube.from_store(source)
+
+
+def year_statistics(source: str | RasterCube, year: int) -> dict[str, float]:
+    """Statistics of one year of a stored dataset or of an in-memory cube."""
+    cube = _cube(source)
+    return summarize(cube.layer(year)[cube.mask])
+
+
+def csv_statistics(path: Path) -> dict[str, float]:
+    """Statistics of the value column (the third one) of an exported CSV."""
+    return summarize(pd.read_csv(path, usecols=[2]).iloc[:, 0].to_numpy(dtype=np.float64))
+
+
+def histograms(source: str | RasterCube, bins: int = HISTOGRAM_BINS) -> dict[str, list]:
+    """Histogram of every year on shared edges, computed in one vectorized pass."""
+    cube = _cube(source)
+    values = cube.series().astype(np.float64)
+    valid = ~np.isnan(values)
+
+    low, high = (values[valid].min(), values[valid].max()) if valid.any() else (0.0, 1.0)
+    edges = np.linspace(low, high if high > low else low + 1, bins + 1)
+
+    bin_index = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+    flat = (np.arange(len(cube.years))[:, None] * bins + bin_index)[valid]
+    counts = np.bincount(flat, minlength=len(cube.years) * bins).reshape(-1, bins)
+
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def dataset_index(dataset: str) -> dict:
+    cube = RasterCube.from_store(dataset)
+    entry = {"fingerprint": store.fingerprint(dataset), "year": cube.years.tolist()}
+    for year in entry["year"]:
+        for key, value in year_statistics(cube, year).items():
+            entry.setdefault(key, []).append(value)
+    entry["histogram"] = histograms(cube)
+    return entry
+
+
+def _write_index(index: dict) -> None:
+    store.atomic_write(INDEX_FILE, json.dumps(index, separators=(",", ":")).encode())
+
+
+def build_index() -> dict:
+    index = {dataset: dataset_index(dataset) for dataset in store.datasets()}
+    _write_index(index)
+    return index
+
+
+def load_index() -> dict:
+    """Load the statistics index, rebuilding the entries of datasets that changed."""
+    index = json.loads(INDEX_FILE.read_text()) if INDEX_FILE.exists() else {}
+
+    stale = [
+        dataset
+        for dataset in store.datasets()
+        if index.get(dataset, {}).get("fingerprint") != store.fingerprint(dataset)
+    ]
+    removed = set(index) - set(store.datasets())
+    if stale or removed:
+        index = {
+            dataset: index[dataset] if dataset not in stale else dataset_index(dataset)
+            for dataset in store.datasets()
+        }
+        try:
+            _write_index(index)
+        except OSError:
+            pass  # read-only deployments keep the refreshed index in memory
+
+    return index
+
+
+def prompt_context(index: dict) -> str:
+    """Render the index as the ``<datatype>`` blocks used in the chatbot prompt."""
+    blocks = []
+    for dataset, entry in index.items():
+        if "land" in dataset:
+            continue  # class codes have no meaningful mean or std
+        lines = [f"name: {dataset}", f"year: {entry['year']}"]
+        lines += [
+            f"{key}: {[int(value) for value in entry[key]]}"
+            for key in ("min", "max", "mean", "std")
+        ]
+        blocks.append("<datatype>\n" + "\n".join(lines) + "\n</datatype>")
+    return "\n".join(blocks)
+
+
+if __name__ == "__main__":
+    index = build_index()
+    print(f"Saved statistics for {', '.join(index)} to {INDEX_FILE}")
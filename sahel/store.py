@@ -0,0 +1,262 @@
+"""Columnar binary store for the gridded datasets.
+
+Every dataset lives in ``dataset/store/<dataset>/`` as three NumPy files:
+
+- ``years.npy``: ``(years,)`` int32, sorted.
+- ``coords.npy``: ``(pixels, 2)`` float64 lon/lat, shared by every year.
+- ``values.npy``: ``(years, pixels)`` float32, NaN where a pixel has no data.
+
+plus ``series.npy``, the same values pixel-major, ``(pixels, years)``. That copy is
+derived, so it is not committed: it is written by every save and otherwise rebuilt
+on first use whenever it is missing or older than ``values.npy``.
+
+Values are memory-mapped, so reading one year touches only that row of
+``values.npy`` and reading the history of one pixel only that row of
+``series.npy``. CSV is only an import/export format:
+
+    python -m sahel.store import dataset/csv/population_density
+    python -m sahel.store export population_density 2020 out.csv
+    python -m sahel.store series  # rebuild series.npy of every dataset
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Override with the SAHEL_STORE environment variable, e.g. to point at synthetic data
+STORE_FOLDER = Path(
+    os.environ.get("SAHEL_STORE", Path(__file__).resolve().parent.parent / "dataset" / "store")
+)
+
+# Coordinates are matched across years within this tolerance, since different
+# tools write the same grid cell with slightly different float noise.
+COORD_TOLERANCE = 1e-6
+
+
+class Cube(NamedTuple):
+    years: np.ndarray
+    coords: np.ndarray
+    values: np.ndarray
+
+
+def datasets() -> list[str]:
+    if not STORE_FOLDER.exists():
+        return []
+    return sorted(
+        folder.name
+        for folder in STORE_FOLDER.iterdir()
+        if (folder / "values.npy").exists()
+    )
+
+
+def years(dataset: str) -> list[int]:
+    return np.load(STORE_FOLDER / dataset / "years.npy").tolist()
+
+
+def fingerprint(dataset: str) -> str:
+    """Content hash of a dataset, stable across checkouts unlike file mtimes."""
+    digest = hashlib.blake2b(digest_size=16)
+    for name in ("years.npy", "coords.npy", "values.npy"):
+        with open(STORE_FOLDER / dataset / name, "rb") as file:
+            digest.update(hashlib.file_digest(file, "blake2b").digest())
+    return digest.hexdigest()
+
+
+def load_cube(dataset: str) -> Cube:
+    folder = STORE_FOLDER / dataset
+    return Cube(
+        years=np.load(folder / "years.npy"),
+        coords=np.load(folder / "coords.npy", mmap_mode="r"),
+        values=np.load(folder / "values.npy", mmap_mode="r"),
+    )
+
+
+def load_series(dataset: str) -> np.ndarray:
+    """``(pixels, years)`` values, memory-mapped so one pixel's history is one contiguous read.
+
+    A missing or stale ``series.npy`` is rewritten first; read-only stores fall back
+    to a transposed copy in memory.
+    """
+    folder = STORE_FOLDER / dataset
+    path = folder / "series.npy"
+    if not path.exists() or path.stat().st_mtime_ns < (folder / "values.npy").stat().st_mtime_ns:
+        try:
+            write_series(dataset)
+        except OSError:
+            return np.ascontiguousarray(np.load(folder / "values.npy", mmap_mode="r").T)
+    return np.load(path, mmap_mode="r")
+
+
+def load(dataset: str, year: int) -> pd.DataFrame:
+    """Load one year as the classic ``lon, lat, value`` table."""
+    cube = load_cube(dataset)
+    index = np.searchsorted(cube.years, year)
+    if index >= len(cube.years) or cube.years[index] != year:
+        raise KeyError(f"{dataset} has no data for {year}")
+
+    values = np.asarray(cube.values[index])
+    valid = ~np.isnan(values)
+    return pd.DataFrame(
+        {
+            "lon": cube.coords[valid, 0],
+            "lat": cube.coords[valid, 1],
+            "value": values[valid],
+        }
+    )
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Write a file so that readers never see it half-written."""
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=".", delete=False) as tmp:
+        tmp.write(data)
+    os.chmod(tmp.name, 0o644)
+    os.replace(tmp.name, path)
+
+
+def _atomic_save(path: Path, array: np.ndarray) -> None:
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    atomic_write(path, buffer.getvalue())
+
+
+def save(dataset: str, years: np.ndarray, coords: np.ndarray, values: np.ndarray) -> None:
+    """Write a whole dataset, replacing each file atomically."""
+    order = np.argsort(years)
+    folder = STORE_FOLDER / dataset
+    folder.mkdir(parents=True, exist_ok=True)
+
+    _atomic_save(folder / "coords.npy", np.ascontiguousarray(coords, dtype=np.float64))
+    _atomic_save(folder / "values.npy", np.ascontiguousarray(values[order], dtype=np.float32))
+    _atomic_save(folder / "series.npy", np.ascontiguousarray(values[order].T, dtype=np.float32))
+    # years.npy goes last: readers only see a dataset once it is complete
+    _atomic_save(folder / "years.npy", np.asarray(years, dtype=np.int32)[order])
+
+
+def _quantize(coords: np.ndarray) -> np.ndarray:
+    return np.round(np.asarray(coords) / COORD_TOLERANCE).astype(np.int64)
+
+
+def match_coords(coords: np.ndarray, new_coords: np.ndarray) -> np.ndarray:
+    """Position of every new pixel among ``coords``, or -1 when it is not there.
+
+    Coordinates are quantized to COORD_TOLERANCE; a value lying on a quantization
+    boundary can land on either side of it, so unmatched pixels are looked up again
+    in the neighbouring keys.
+    """
+    keys = _quantize(coords)
+    index = pd.MultiIndex.from_arrays([keys[:, 0], keys[:, 1]])
+    new_keys = _quantize(new_coords)
+    positions = np.full(len(new_keys), -1, dtype=np.int64)
+
+    for dx in (0, -1, 1):
+        for dy in (0, -1, 1):
+            missing = np.flatnonzero(positions < 0)
+            if len(missing) == 0 or len(index) == 0:
+                return positions
+            positions[missing] = index.get_indexer(
+                pd.MultiIndex.from_arrays(
+                    [new_keys[missing, 0] + dx, new_keys[missing, 1] + dy]
+                )
+            )
+    return positions
+
+
+def write_years(dataset: str, frames: dict[int, pd.DataFrame]) -> None:
+    """Add or replace years of a dataset from ``lon, lat, value`` tables.
+
+    Pixels are aligned on their coordinates; cells that appear for the first time
+    are appended, and years that do not cover them stay NaN.
+    """
+    if (STORE_FOLDER / dataset / "years.npy").exists():
+        cube = load_cube(dataset)
+        all_years = cube.years.tolist()
+        coords = np.array(cube.coords)
+        values = np.array(cube.values)
+    else:
+        all_years = []
+        coords = np.empty((0, 2))
+        values = np.empty((0, 0), dtype=np.float32)
+
+    for year, df in sorted(frames.items()):
+        new_coords = df[["lon", "lat"]].to_numpy(dtype=np.float64)
+        positions = match_coords(coords, new_coords)
+
+        missing = positions < 0
+        if missing.any():
+            positions[missing] = np.arange(len(coords), len(coords) + missing.sum())
+            coords = np.concatenate([coords, new_coords[missing]])
+            values = np.pad(values, ((0, 0), (0, missing.sum())), constant_values=np.nan)
+
+        row = np.full(len(coords), np.nan, dtype=np.float32)
+        row[positions] = df["value"].to_numpy()
+
+        if year in all_years:
+            values[all_years.index(year)] = row
+        else:
+            all_years.append(year)
+            values = np.concatenate([values, row[None]])
+
+    save(dataset, np.array(all_years), coords, values)
+
+
+def write_series(dataset: str) -> None:
+    """Rewrite the pixel-major copy of a dataset from ``values.npy``."""
+    folder = STORE_FOLDER / dataset
+    values = np.load(folder / "values.npy", mmap_mode="r")
+    _atomic_save(folder / "series.npy", np.ascontiguousarray(values.T))
+
+
+def import_csv(folder: Path, dataset: str | None = None) -> None:
+    """Import every ``<year>.csv`` in a folder into the store."""
+    folder = Path(folder)
+    frames = {
+        int(file.stem): pd.read_csv(file)
+        for file in sorted(folder.glob("*.csv"))
+        if file.stem.isdigit()
+    }
+    write_years(dataset or folder.name, frames)
+
+
+def export_csv(dataset: str, year: int, path: Path) -> None:
+    load(dataset, year).to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the columnar dataset store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="import per-year CSVs")
+    import_parser.add_argument("folders", type=Path, nargs="+")
+    import_parser.add_argument("--dataset", help="target dataset (default: folder name)")
+
+    export_parser = commands.add_parser("export", help="export one year as CSV")
+    export_parser.add_argument("dataset")
+    export_parser.add_argument("year", type=int)
+    export_parser.add_argument("path", type=Path)
+
+    series_parser = commands.add_parser("series", help="rebuild the pixel-major copies")
+    series_parser.add_argument("datasets", nargs="*", help="datasets (default: all)")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        for folder in args.folders:
+            import_csv(folder, args.dataset)
+            print(f"Imported {folder} into {args.dataset or folder.name}")
+    elif args.command == "series":
+        for dataset in args.datasets or datasets():
+            write_series(dataset)
+            print(f"Wrote the series of {dataset}")
+    else:
+        export_csv(args.dataset, args.year, args.path)
+        print(f"Saved {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Timelapse videos rendered straight from the stored cubes.
+
+Every year of a dataset is colour-mapped into an RGB frame with one vectorized
+lookup (`sahel.render`), frames are rendered in a process pool and piped in order
+into ffmpeg as raw video. A manifest next to the videos remembers the fingerprint
+of the data and settings each video was encoded from, so a run only re-encodes
+the videos whose dataset changed, e.g. after new forecasts were stored:
+
+    python -m sahel.timelapse [datasets...] [--workers N] [--force]
+
+Continuous datasets share one colour range over all years (the 1st to 99th
+percentile), so frames compare with each other. Cells are
+scaled up so the map is about TARGET_PIXELS on its longest side, under a banner
+with the year. ffmpeg must be on the PATH.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from sahel import render, store
+from sahel.cube import RasterCube
+
+VIDEO_FOLDER = Path(__file__).resolve().parent.parent / "website" / "static" / "videos"
+MANIFEST = VIDEO_FOLDER / "timelapse.json"
+# Bump to re-encode every video when the rendering changes
+CACHE_VERSION = 2
+FRAMES_PER_SECOND = 2
+OUTPUT_RATE = 25
+BACKGROUND = (17, 17, 17)
+TEXT_COLOR = (255, 255, 255)
+FORECAST_COLOR = (253, 231, 37)  # the year of forecast frames
+FIRST_FORECAST_YEAR = 2024
+# Longest side of the map in the frames, about that of the original videos
+TARGET_PIXELS = 800
+# 3x5 bitmap digits for the year label
+DIGITS = {
+    "0": ("111", "101", "101", "101", "111"),
+    "1": ("010", "110", "010", "010", "111"),
+    "2": ("111", "001", "111", "100", "111"),
+    "3": ("111", "001", "111", "001", "111"),
+    "4": ("101", "101", "111", "001", "001"),
+    "5": ("111", "100", "111", "001", "111"),
+    "6": ("111", "100", "111", "101", "111"),
+    "7": ("111", "001", "010", "010", "010"),
+    "8": ("111", "101", "111", "101", "111"),
+    "9": ("111", "101", "111", "001", "111"),
+}
+VIRIDIS = (
+    "#440154", "#482878", "#3e4989", "#31688e", "#26828e",
+    "#1f9e89", "#35b779", "#6ece58", "#b5de2b", "#fde725",
+)
+
+
+@dataclass(frozen=True)
+class Style:
+    stops: tuple[str, ...] = VIRIDIS
+    classes: tuple[tuple[float, str], ...] = ()  # (class code, colour) of categorical data
+    percentiles: tuple[float, float] = render.COLOR_PERCENTILES  # colour range of continuous data
+    scale: int | None = None  # output pixels per cell (default: from TARGET_PIXELS)
+
+
+# The MODIS land cover palette of the app's maps
+LAND_COVER_COLORS = (
+    (0, "#1f77b4"), (1, "#7f7f7f"), (2, "#2ca02c"), (3, "#d62728"), (4, "#9467bd"),
+    (5, "#8c564b"), (6, "#e377c2"), (7, "#ff7f0e"), (8, "#1f77b4"), (9, "#17becf"),
+    (10, "#64700f"), (11, "#ff7f0e"), (12, "#bcbd22"), (13, "#7f7f7f"), (14, "#9467bd"),
+    (15, "#e377c2"), (16, "#8c564b"), (255, "#d62728"),
+)
+
+TIMELAPSES = {
+    "climate_precipitation": "timelapse_precipitazioni.mp4",
+    "gross_primary": "timelapse_gross.mp4",
+    "land_cover": "timelapse_land.mp4",
+    "population_density": "timelapse_population.mp4",
+}
+STYLES = {"land_cover": Style(classes=LAND_COVER_COLORS)}
+
+
+def cell_scale(cube: RasterCube, style: Style) -> int:
+    """Output pixels per cell, so the longest side of the map is about TARGET_PIXELS."""
+    if style.scale is not None:
+        return style.scale
+    return max(1, round(TARGET_PIXELS / max(cube.grid.rows, cube.grid.cols)))
+
+
+def text_scale(width: int) -> int:
+    """Output pixels per pixel of the bitmap digits."""
+    return max(2, width // 120)
+
+
+def frame_size(cube: RasterCube, style: Style) -> tuple[int, int]:
+    """``(width, height)`` of the frames: the scaled map under the year banner."""
+    scale = cell_scale(cube, style)
+    width = cube.grid.cols * scale
+    height = cube.grid.rows * scale + 7 * text_scale(width)
+    return width + width % 2, height + height % 2
+
+
+def draw_label(frame: np.ndarray, text: str, color: tuple[int, int, int], scale: int) -> None:
+    """Draw the digits of ``text`` into the top left corner of an RGB frame, in place."""
+    left = scale
+    for digit in text:
+        glyph = np.array([[pixel == "1" for pixel in row] for row in DIGITS[digit]])
+        glyph = glyph.repeat(scale, axis=0).repeat(scale, axis=1)
+        rows, cols = glyph.shape
+        frame[scale:scale + rows, left:left + cols][glyph] = color
+        left += cols + scale
+
+
+def render_frame(layer: np.ndarray, year: int, style: Style, vmin: float, vmax: float, size: tuple[int, int]) -> bytes:
+    """One ``(rows, cols)`` layer and its year as a raw RGB24 frame of ``size``."""
+    if style.classes:
+        rgba = render.colorize_categories(layer, dict(style.classes))
+    else:
+        rgba = render.colorize(layer, render.colormap_lut(list(style.stops)), vmin, vmax)
+    rgb = np.where(rgba[..., 3:] > 0, rgba[..., :3], np.array(BACKGROUND, dtype=np.uint8))
+    width, height = size
+    scale = width // layer.shape[1]
+    rgb = rgb.repeat(scale, axis=0).repeat(scale, axis=1)
+
+    # The map goes under the year banner; the even sides H.264 requires are padding
+    rows, cols = rgb.shape[:2]
+    label_scale = text_scale(cols)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = BACKGROUND
+    frame[7 * label_scale:7 * label_scale + rows, :cols] = rgb
+    draw_label(frame, str(year), FORECAST_COLOR if year >= FIRST_FORECAST_YEAR else TEXT_COLOR, label_scale)
+    return frame.tobytes()
+
+
+def fingerprint(dataset: str, style: Style) -> str:
+    key = (CACHE_VERSION, store.fingerprint(dataset), style, TARGET_PIXELS, FRAMES_PER_SECOND, OUTPUT_RATE)
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+def _read_manifest() -> dict[str, str]:
+    return json.loads(MANIFEST.read_text()) if MANIFEST.exists() else {}
+
+
+def encode(dataset: str, path: Path, style: Style, workers: int | None = None) -> None:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg was not found on the PATH")
+
+    cube = RasterCube.from_store(dataset)
+    dense = cube.dense()
+    vmin, vmax = (0.0, 0.0) if style.classes else render.color_range(dense, style.percentiles)
+    width, height = frame_size(cube, style)
+
+    # ffmpeg picks the container from the suffix, so the partial file keeps it
+    partial_path = path.with_name(f".{path.stem}.partial{path.suffix}")
+    command = [
+        ffmpeg, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+        "-framerate", str(FRAMES_PER_SECOND), "-i", "-",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-r", str(OUTPUT_RATE),
+        "-movflags", "+faststart", str(partial_path),
+    ]
+    try:
+        with subprocess.Popen(command, stdin=subprocess.PIPE) as process, ProcessPoolExecutor(workers) as pool:
+            # Frames come back in year order while later ones are still being rendered
+            render_year = partial(render_frame, style=style, vmin=vmin, vmax=vmax, size=(width, height))
+            for frame in pool.map(render_year, dense, cube.years.tolist()):
+                process.stdin.write(frame)
+            process.stdin.close()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed with exit code {process.returncode}")
+        os.replace(partial_path, path)
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+
+
+def build(datasets: list[str] | None = None, workers: int | None = None, force: bool = False) -> list[str]:
+    """Re-encode the timelapses whose data or settings changed; returns the datasets encoded."""
+    manifest = _read_manifest()
+    encoded = []
+    for dataset in datasets or [dataset for dataset in TIMELAPSES if dataset in store.datasets()]:
+        style = STYLES.get(dataset, Style())
+        path = VIDEO_FOLDER / TIMELAPSES.get(dataset, f"timelapse_{dataset}.mp4")
+        key = fingerprint(dataset, style)
+        if not force and path.exists() and manifest.get(path.name) == key:
+            continue
+
+        encode(dataset, path, style, workers)
+        manifest[path.name] = key
+        store.atomic_write(MANIFEST, (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode())
+        encoded.append(dataset)
+    return encoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the timelapse videos from the store")
+    parser.add_argument("datasets", nargs="*", help="datasets (default: every one with a timelapse)")
+    parser.add_argument("--workers", type=int, help="frame rendering processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-encode even if nothing changed")
+    args = parser.parse_args()
+
+    encoded = build(args.datasets, args.workers, args.force)
+    for dataset in encoded:
+        print(f"Encoded the timelapse of {dataset}")
+    if not encoded:
+        print("Every timelapse is up to date")
+
+
+if __name__ == "__main__":
+    main()
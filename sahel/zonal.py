@@ -0,0 +1,174 @@
+"""Zonal statistics over the Assaba admin layers.
+
+Each layer's polygons are rasterized once per dataset grid into a label array
+(0 outside every zone, ``k + 1`` inside zone ``k``), cached on disk under
+``dataset/store/.cache``. Statistics for every zone and every year then
+come from one pass over the labelled cells: counts and sums from `np.bincount`,
+minimum, maximum and percentiles from a single sort by (year, zone, value).
+
+    zonal_table(RasterCube.from_store("population_density"), "districts")
+"""
+
+import hashlib
+import io
+from dataclasses import astuple, dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sahel import store
+from sahel.cube import RasterCube
+from sahel.grid import GridSpec
+from sahel.shapes import edges, read_shapefile
+from sahel.stats import PERCENTILES
+
+ADMIN_FOLDER = Path(__file__).resolve().parent.parent / "dataset" / "original" / "Admin_layers"
+CACHE_FOLDER = store.STORE_FOLDER / ".cache" / "zones"
+
+
+@dataclass(frozen=True)
+class ZoneLayer:
+    shapefile: str
+    name_field: str
+
+
+LAYERS = {
+    "districts": ZoneLayer("Assaba_Districts_layer", "ADM3_EN"),
+    "regions": ZoneLayer("Assaba_Region_layer", "ADM2_EN"),
+}
+
+
+def rasterize(polygons: list[list[np.ndarray]], grid: GridSpec) -> np.ndarray:
+    """Label the grid cells whose centre lies in each polygon (even-odd rule).
+
+    For every row, the crossings of the polygon edges with the row's centre line
+    toggle a parity flag from the first cell centre to their right; a cumulative
+    sum along the row then marks the cells inside. Earlier polygons win overlaps.
+    """
+    labels = np.zeros(grid.shape, dtype=np.int16)
+    lat = grid.north - (np.arange(grid.rows) + 0.5) * grid.yres
+
+    for label, parts in enumerate(polygons, start=1):
+        x0, y0, x1, y1 = edges(parts).T
+        low, high = np.minimum(y0, y1), np.maximum(y0, y1)
+
+        # Rows whose centre line lies in [low, high) of each edge
+        first = np.floor((grid.north - high) / grid.yres - 0.5).astype(np.int64) + 1
+        last = np.floor((grid.north - low) / grid.yres - 0.5).astype(np.int64)
+        first, last = np.maximum(first, 0), np.minimum(last, grid.rows - 1)
+        counts = np.maximum(last - first + 1, 0)
+
+        edge = np.repeat(np.arange(len(x0)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        row = np.repeat(first, counts) + offsets
+        y = lat[row]
+        # Exclude the exact upper end point so a vertex is counted once
+        keep = (y >= low[edge]) & (y < high[edge])
+        edge, row, y = edge[keep], row[keep], y[keep]
+
+        x = x0[edge] + (y - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+        col = np.clip(np.ceil((x - grid.west) / grid.xres - 0.5).astype(np.int64), 0, grid.cols)
+
+        toggles = np.zeros((grid.rows, grid.cols + 1), dtype=np.int32)
+        np.add.at(toggles, (row, col), 1)
+        inside = (np.cumsum(toggles, axis=1)[:, :-1] % 2 == 1) & (labels == 0)
+        labels[inside] = label
+
+    return labels
+
+
+@lru_cache(maxsize=None)
+def _layer_shapes(layer: str):
+    return read_shapefile(ADMIN_FOLDER / LAYERS[layer].shapefile)
+
+
+def zone_names(layer: str = "districts") -> list[str]:
+    return [shape.record[LAYERS[layer].name_field] for shape in _layer_shapes(layer)]
+
+
+def _cache_path(layer: str, grid: GridSpec) -> Path:
+    shp = (ADMIN_FOLDER / LAYERS[layer].shapefile).with_suffix(".shp")
+    stat = shp.stat()
+    key = repr((layer, astuple(grid), stat.st_size, stat.st_mtime_ns)).encode()
+    return CACHE_FOLDER / f"{hashlib.blake2b(key, digest_size=12).hexdigest()}.npy"
+
+
+def zone_labels(layer: str, grid: GridSpec) -> np.ndarray:
+    """The label array of a layer on a grid, rasterized once and then read from disk."""
+    path = _cache_path(layer, grid)
+    if path.exists():
+        return np.load(path)
+
+    labels = rasterize([shape.parts for shape in _layer_shapes(layer)], grid)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        buffer = io.BytesIO()
+        np.save(buffer, labels)
+        store.atomic_write(path, buffer.getvalue())
+    except OSError:
+        pass  # read-only deployments rasterize in every process
+    return labels
+
+
+def zonal_statistics(values: np.ndarray, labels: np.ndarray, zones: int) -> dict[str, np.ndarray]:
+    """Statistics of ``(years, rows, cols)`` values per year and zone, as ``(years, zones)`` arrays.
+
+    Percentiles use linear interpolation, like `np.percentile`. Zones without data
+    in a year get a count of 0 and NaN everywhere else.
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+    years = len(values)
+    groups = years * zones
+
+    # One group per (year, zone); cells outside every zone or without data are dropped
+    key = np.arange(years)[:, None] * zones + (labels.reshape(-1).astype(np.int64) - 1)
+    valid = (labels.reshape(-1) > 0) & ~np.isnan(values)
+    key, x = key[valid], values[valid]
+
+    count = np.bincount(key, minlength=groups)
+    total = np.bincount(key, weights=x, minlength=groups)
+
+    order = np.lexsort((x, key))
+    ordered = x[order]
+    start = np.cumsum(count) - count
+    present = count > 0
+    last = start + np.maximum(count - 1, 0)
+
+    def pick(position: np.ndarray) -> np.ndarray:
+        result = np.full(groups, np.nan)
+        result[present] = ordered[position[present]]
+        return result
+
+    statistics = {
+        "count": count,
+        "sum": np.where(present, total, np.nan),
+        "mean": np.divide(total, count, out=np.full(groups, np.nan), where=present),
+        "min": pick(start),
+        "max": pick(last),
+    }
+    for p in PERCENTILES:
+        position = start + (count - 1).clip(0) * p / 100
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, last)
+        fraction = position - low
+        statistics[f"p{p}"] = pick(low) * (1 - fraction) + pick(high) * fraction
+
+    return {name: array.reshape(years, zones) for name, array in statistics.items()}
+
+
+def zonal_table(cube: RasterCube, layer: str = "districts") -> pd.DataFrame:
+    """Per-zone statistics of every year of a cube, one row per (year, zone)."""
+    names = zone_names(layer)
+    statistics = zonal_statistics(cube.dense(), zone_labels(layer, cube.grid), len(names))
+
+    table = pd.DataFrame(
+        {
+            "year": np.repeat(cube.years, len(names)),
+            "zone": np.tile(names, len(cube.years)),
+        }
+    )
+    for name, array in statistics.items():
+        table[name] = array.reshape(-1)
+    return table
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# The shared package lives in the project root; the ML scripts import each other by module name
+sys.path[:0] = [str(ROOT), str(ROOT / "ml")]
@@ -0,0 +1,65 @@
+import numpy as np
+
+from sahel import correlate, ingest
+
+
+def test_coefficients_ignore_fill_and_non_finite_cells():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=200)
+    y = 2 * x + rng.normal(size=200)
+    real = np.ones(200, dtype=bool)
+
+    # MODIS fill codes where x is lowest (like the bare cells of the rasters), and stray infinities
+    fill = np.argsort(x)[:30]
+    raw = y.copy()
+    raw[fill] = 65533
+    real[fill] = False
+    stray = np.flatnonzero(real)[:5]
+    x[stray] = np.inf
+    real[stray] = False
+    y = ingest.mask_fill(raw, ingest.MODIS_FILL_FROM)
+
+    expected_pearson = np.corrcoef(x[real], y[real])[0, 1]
+    expected_spearman = np.corrcoef(x[real].argsort().argsort(), y[real].argsort().argsort())[0, 1]
+    assert np.isclose(correlate.pearson(x, y), expected_pearson)
+    assert np.isclose(correlate.spearman(x, y), expected_spearman)
+    assert correlate.summary(x, y)["cells"] == real.sum()
+
+    # Left in, the fill codes flip the sign of the coefficient
+    assert expected_pearson > 0
+    assert correlate.pearson(x, raw) < 0
+
+
+def test_rank_averages_ties():
+    assert correlate.rank(np.array([3.0, 1.0, 3.0, 2.0])).tolist() == [3.5, 1.0, 3.5, 2.0]
+
+
+def test_window_sums_match_loop():
+    rng = np.random.default_rng(4)
+    values = rng.normal(size=(9, 13, 2))
+    for radius in (0, 1, 3, 20):
+        expected = np.zeros_like(values)
+        for row in range(values.shape[0]):
+            for col in range(values.shape[1]):
+                window = values[max(row - radius, 0):row + radius + 1, max(col - radius, 0):col + radius + 1]
+                expected[row, col] = window.sum(axis=(0, 1))
+        np.testing.assert_allclose(correlate.window_sums(values, radius), expected, atol=1e-9)
+
+
+def test_local_correlation_matches_windowed_corrcoef():
+    rng = np.random.default_rng(5)
+    x = rng.normal(size=(12, 10))
+    y = x + rng.normal(size=(12, 10))
+    x[rng.random(x.shape) < 0.2] = np.nan
+    radius = 2
+
+    result = correlate.local_correlation(x, y, radius, min_cells=5)
+    for row in range(x.shape[0]):
+        for col in range(x.shape[1]):
+            window = (slice(max(row - radius, 0), row + radius + 1), slice(max(col - radius, 0), col + radius + 1))
+            a, b = x[window].ravel(), y[window].ravel()
+            both = np.isfinite(a) & np.isfinite(b)
+            if np.isnan(x[row, col]) or both.sum() < 5:
+                assert np.isnan(result[row, col])
+            else:
+                assert np.isclose(result[row, col], np.corrcoef(a[both], b[both])[0, 1], atol=1e-5)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from sahel import distance
+
+
+def _brute_force(mask, xres, yres):
+    """Distance from every cell to every True cell, keeping the smallest."""
+    rows, cols = np.indices(mask.shape)
+    target_rows, target_cols = np.nonzero(mask)
+    dy = (rows[..., None] - target_rows) * yres
+    dx = (cols[..., None] - target_cols) * xres
+    return np.sqrt(dx**2 + dy**2).min(axis=-1)
+
+
+@pytest.mark.parametrize("shape", [(23, 17), (11, 40)], ids=["tall", "wide"])
+@pytest.mark.parametrize("density", [0.02, 0.3])
+def test_distance_transform_matches_brute_force(shape, density):
+    rng = np.random.default_rng(6)
+    mask = rng.random(shape) < density
+    mask[0, 0] = True
+    xres, yres = 0.97, 1.11  # non-square cells, as for a lon/lat grid in km
+
+    np.testing.assert_allclose(
+        distance.distance_transform(mask, xres, yres), _brute_force(mask, xres, yres)
+    )
+
+
+def test_distance_transform_of_empty_mask_is_inf():
+    assert np.isinf(distance.distance_transform(np.zeros((4, 6), dtype=bool))).all()
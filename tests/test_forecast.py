@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from forecast import fit_ar, forecast, historical_mean
+from forecast_runner import run
+
+AutoReg = pytest.importorskip("statsmodels.tsa.ar_model").AutoReg
+
+
+def _matrix(rng, pixels=25, years=15):
+    """Series whose yearly changes follow an AR(2), so ARIMA(2, 1, 0) fits them."""
+    changes = np.zeros((pixels, years))
+    changes[:, :2] = rng.normal(size=(pixels, 2))
+    for t in range(2, years):
+        changes[:, t] = 0.5 * changes[:, t - 1] - 0.3 * changes[:, t - 2] + rng.normal(size=pixels)
+    return 100 + np.cumsum(changes, axis=1)
+
+
+def _reference(series, p, steps):
+    """Per-pixel ARIMA(p, 1, 0) without constant, by conditional least squares."""
+    model = AutoReg(np.diff(series), lags=p, trend="n").fit()
+    changes = model.predict(start=len(series) - 1, end=len(series) + steps - 2)
+    return model.params, series[-1] + np.cumsum(changes)
+
+
+def test_forecast_matches_per_pixel_arima():
+    matrix = _matrix(np.random.default_rng(7))
+    predictions, fitted, enough = forecast(matrix, order=(2, 1, 0), steps=3)
+    coef, ok = fit_ar(np.diff(matrix, axis=1), 2)
+
+    assert fitted.all() and enough.all() and ok.all()
+    for pixel, series in enumerate(matrix):
+        params, expected = _reference(series, 2, 3)
+        np.testing.assert_allclose(coef[pixel], params, rtol=1e-8)
+        np.testing.assert_allclose(predictions[pixel], expected, rtol=1e-8)
+
+
+# Two changes per parameter leave statsmodels no degrees of freedom for the covariance
+@pytest.mark.filterwarnings("ignore")
+def test_short_series_lower_the_order():
+    matrix = _matrix(np.random.default_rng(8), years=5)
+    predictions, fitted, _ = forecast(matrix, order=(5, 1, 0), steps=2)
+
+    # Four yearly changes leave room for an AR(2) at most
+    assert fitted.all()
+    for pixel, series in enumerate(matrix):
+        np.testing.assert_allclose(predictions[pixel], _reference(series, 2, 2)[1], rtol=1e-8)
+
+
+def test_unfitted_pixels_and_min_obs():
+    matrix = _matrix(np.random.default_rng(9), pixels=6)
+    matrix[1] = 42.0  # constant: a singular system, not estimable
+    matrix[2, 4] = np.nan  # a gap: enough years, but not a complete series
+    matrix[3, 2:] = np.nan  # two years only
+    predictions, fitted, enough = forecast(matrix, order=(2, 1, 0), steps=2, min_obs=3)
+
+    assert fitted.tolist() == [True, False, False, False, True, True]
+    assert enough.tolist() == [True, True, True, False, True, True]
+    assert np.isnan(predictions[~fitted]).all()
+    assert np.isfinite(predictions[fitted]).all()
+
+    # The runner's fallback fills the unfitted pixels with their historical mean
+    means = historical_mean(matrix)
+    for pixel, series in enumerate(matrix):
+        assert np.isclose(means[pixel], series[~np.isnan(series)].mean())
+    runner_predictions, runner_fitted, runner_enough = run(matrix, (2, 1, 0), steps=2, min_obs=3, chunk_size=4)
+    np.testing.assert_array_equal(runner_predictions, predictions)
+    np.testing.assert_array_equal(runner_fitted, fitted)
+    np.testing.assert_array_equal(runner_enough, enough)
+    filled = np.where(runner_fitted[:, None], runner_predictions, means[:, None])[runner_enough]
+    assert np.isfinite(filled).all()
+    np.testing.assert_allclose(filled[1:3], means[[1, 2], None].repeat(2, axis=1))
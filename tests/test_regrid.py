@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from sahel import regrid
+from sahel.grid import GridSpec
+
+SOURCE = GridSpec(west=-12.0, north=17.0, xres=0.05, yres=0.04, rows=30, cols=40)
+TARGETS = {
+    "coarser": GridSpec(west=-11.93, north=16.97, xres=0.13, yres=0.11, rows=11, cols=16),
+    "finer": GridSpec(west=-12.02, north=17.01, xres=0.021, yres=0.017, rows=60, cols=90),
+}
+
+
+def _edges(start, step, n):
+    return start + np.arange(n) * step, start + (np.arange(n) + 1) * step
+
+
+def _axis_matrix(method, target, source):
+    """Dense ``(target_n, source_n)`` weights of one axis, each pair computed on its own."""
+    t_low, t_high = _edges(*target)
+    s_low, s_high = _edges(*source)
+    t_centre, s_centre = (t_low + t_high) / 2, (s_low + s_high) / 2
+    step = source[1]
+    matrix = np.zeros((target[2], source[2]))
+    for t in range(target[2]):
+        for s in range(source[2]):
+            if method == "nearest":
+                matrix[t, s] = s_low[s] <= t_centre[t] < s_high[s]
+            elif method == "bilinear":
+                matrix[t, s] = max(0.0, 1 - abs(t_centre[t] - s_centre[s]) / step)
+            else:
+                overlap = (min(t_high[t], s_high[s]) - max(t_low[t], s_low[s])) / step
+                # Cells that only share an edge do not overlap, whatever the float noise
+                matrix[t, s] = overlap if overlap > 1e-9 else 0.0
+    return matrix
+
+
+def _dense_regrid(values, source, target, method):
+    # Rows run southwards, so they are measured along -lat like in the module
+    rows = _axis_matrix(
+        method, (-target.north, target.yres, target.rows), (-source.north, source.yres, source.rows)
+    )
+    cols = _axis_matrix(
+        method, (target.west, target.xres, target.cols), (source.west, source.xres, source.cols)
+    )
+    weights = np.kron(rows, cols)
+
+    x = values.reshape(-1)
+    valid = ~np.isnan(x)
+    total = weights @ np.where(valid, x, 0)
+    weight = weights @ valid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = np.where(weight > 0, total / weight, np.nan)
+    return result.reshape(target.shape)
+
+
+@pytest.mark.parametrize("method", regrid.METHODS)
+@pytest.mark.parametrize("target", TARGETS.values(), ids=TARGETS.keys())
+def test_map_matches_dense_matrix(method, target):
+    rng = np.random.default_rng(3)
+    values = rng.normal(100, 20, size=SOURCE.shape)
+    values[rng.random(SOURCE.shape) < 0.15] = np.nan
+    values[:5, :8] = np.nan  # a block without data
+
+    result = regrid.build_map(SOURCE, target, method).apply(values)
+    expected = _dense_regrid(values, SOURCE, target, method)
+
+    np.testing.assert_array_equal(np.isnan(result), np.isnan(expected))
+    np.testing.assert_allclose(result, expected, rtol=1e-5, equal_nan=True)
@@ -0,0 +1,80 @@
+import numpy as np
+
+from sahel import zonal
+from sahel.grid import GridSpec
+from sahel.stats import PERCENTILES
+
+GRID = GridSpec(west=-12.0, north=17.0, xres=0.1, yres=0.08, rows=40, cols=50)
+
+
+def _ring(rng, centre, radius, vertices):
+    """A closed star-shaped ring, first vertex repeated last as in shapefiles."""
+    angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+    radii = radius * rng.uniform(0.4, 1.0, vertices)
+    ring = np.column_stack([centre[0] + radii * np.cos(angles), centre[1] + radii * np.sin(angles)])
+    return np.vstack([ring, ring[:1]])
+
+
+def _inside(parts, x, y):
+    """Even-odd rule by casting a ray to the right of each point, one edge at a time."""
+    inside = np.zeros(x.shape, dtype=bool)
+    for part in parts:
+        for (x0, y0), (x1, y1) in zip(part[:-1], part[1:]):
+            crosses = (y0 > y) != (y1 > y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                at = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+            inside ^= crosses & (x < at)
+    return inside
+
+
+def test_rasterize_matches_point_in_polygon():
+    rng = np.random.default_rng(1)
+    west, south, east, north = GRID.bounds
+    polygons = []
+    for _ in range(4):
+        centre = rng.uniform([west + 1, south + 0.8], [east - 1, north - 0.8])
+        outer = _ring(rng, centre, 1.5, 12)
+        # A hole in half of the polygons, and one polygon reaching past the grid edge
+        hole = _ring(rng, centre, 0.3, 6)
+        polygons.append([outer, hole] if len(polygons) % 2 else [outer])
+    polygons.append([_ring(rng, (east, north), 1.0, 8)])
+
+    lon, lat = GRID.centers()
+    x, y = np.meshgrid(lon, lat)
+    expected = np.zeros(GRID.shape, dtype=np.int16)
+    for label, parts in enumerate(polygons, start=1):
+        expected[_inside(parts, x, y) & (expected == 0)] = label
+
+    labels = zonal.rasterize(polygons, GRID)
+    assert (expected > 0).sum() > 0
+    np.testing.assert_array_equal(labels, expected)
+    np.testing.assert_array_equal(
+        np.bincount(labels.ravel(), minlength=len(polygons) + 1),
+        np.bincount(expected.ravel(), minlength=len(polygons) + 1),
+    )
+
+
+def test_zonal_statistics_match_numpy_per_zone():
+    rng = np.random.default_rng(2)
+    zones = 5
+    values = rng.gamma(2.0, 10.0, size=(3, 12, 15))
+    values[rng.random(values.shape) < 0.2] = np.nan
+    values[1, :, :] = np.nan  # a year without data
+    labels = rng.integers(0, zones + 1, size=(12, 15)).astype(np.int16)
+    labels[labels == 4] = 0  # a zone without cells
+
+    statistics = zonal.zonal_statistics(values, labels, zones)
+
+    for year in range(len(values)):
+        for zone in range(zones):
+            cells = values[year][(labels == zone + 1) & ~np.isnan(values[year])]
+            assert statistics["count"][year, zone] == len(cells)
+            if len(cells) == 0:
+                assert all(np.isnan(statistics[name][year, zone]) for name in statistics if name != "count")
+                continue
+            assert np.isclose(statistics["sum"][year, zone], cells.sum())
+            assert np.isclose(statistics["mean"][year, zone], cells.mean())
+            assert statistics["min"][year, zone] == cells.min()
+            assert statistics["max"][year, zone] == cells.max()
+            for p in PERCENTILES:
+                assert np.isclose(statistics[f"p{p}"][year, zone], np.percentile(cells, p))
@@ -1,5 +1,7 @@
 import streamlit as st
-from utils import IMAGE_FOLDER
+from utils import IMAGE_FOLDER, PageRun
+
+page_run = PageRun("home")
 
 st.set_page_config(
     page_title="START Hack 2025 - Innovating for Land Restoration",
@@ -44,3 +46,5 @@ st.markdown("""
 
 Through this **hackathon**, we invite innovators to develop solutions that contribute to global land restoration, empower communities, and drive meaningful environmental change.
 """)
+
+page_run.finish()
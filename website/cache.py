@@ -0,0 +1,123 @@
+"""Process-wide cache shared by every Streamlit session.
+
+`st.cache_data` hands each caller its own unpickled copy, so every session used to
+hold a private copy of every figure. This cache stores one entry per key for the
+whole process, evicts the least recently used entries once a byte budget is
+exceeded, and hands out references to the same object. Sessions keep only the
+keys of what they asked for, so the budget bounds every cached figure and table
+of the process.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any
+
+# Override with the SAHEL_CACHE_BYTES environment variable
+DEFAULT_BUDGET_BYTES = 512 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    value: Any
+    nbytes: int
+
+
+class SharedCache:
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        # Key of every cached value by identity, to look up the size recorded for it
+        self._keys: dict[int, Hashable] = {}
+        self._pending: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(
+        self, key: Hashable, factory: Callable[[], Any], sizeof: Callable[[Any], int]
+    ) -> Any:
+        """Return the cached value for `key`, building it once if needed.
+
+        Concurrent callers asking for the same missing key wait for a single build.
+        Cached values are shared between sessions and must not be mutated.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+
+            self.misses += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            value = factory()
+            entry = CacheEntry(value=value, nbytes=sizeof(value))
+        except BaseException as error:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(error)
+            raise
+
+        with self._lock:
+            del self._pending[key]
+            self._entries[key] = entry
+            self._keys[id(value)] = key
+            self._nbytes += entry.nbytes
+            self._evict()
+        pending.set_result(value)
+        return value
+
+    def _evict(self) -> None:
+        # The newest entry is always kept, even if it alone exceeds the budget
+        while self._nbytes > self.budget_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._keys.pop(id(entry.value), None)
+            self._nbytes -= entry.nbytes
+            self.evictions += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether `key` is cached, without counting a hit or refreshing it."""
+        with self._lock:
+            return key in self._entries
+
+    def nbytes(self, value: Any) -> int | None:
+        """Size recorded for a cached value, or None if it is not (or no longer) cached."""
+        with self._lock:
+            entry = self._entries.get(self._keys.get(id(value)))
+            return entry.nbytes if entry is not None and entry.value is value else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self._nbytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._nbytes,
+                "budget_bytes": self.budget_bytes,
+            }
+
+
+shared_cache = SharedCache(int(os.environ.get("SAHEL_CACHE_BYTES", DEFAULT_BUDGET_BYTES)))
@@ -0,0 +1,291 @@
+"""Prometheus metrics of the app's hot paths, served on a local HTTP endpoint.
+
+Latencies are histograms, cache traffic is counted per cache and result, and the
+bytes handed to the browser are recorded per element. Everything lives in one
+process-wide registry rendered in the Prometheus text format on
+``http://<SAHEL_METRICS_HOST>:<SAHEL_METRICS_PORT>/metrics`` (port 0 disables the
+endpoint). The endpoint only listens on the loopback interface unless
+SAHEL_METRICS_HOST says otherwise. The dashboard under ``monitoring/`` graphs
+them through the Prometheus and Grafana services of ``compose.yaml``.
+
+    @timed(LOAD_SECONDS, source="zonal")
+    def load_zonal_table(dataset, layer): ...
+
+    with timed(VIDEO_READ_SECONDS):
+        video = path.read_bytes()
+"""
+
+import math
+import os
+import resource
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Override with the SAHEL_METRICS_HOST and SAHEL_METRICS_PORT environment variables
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9464
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = tuple(1024 * 4**power for power in range(10))  # 1 KiB to 256 MiB
+# Sessions that have not rerun for this long are dropped from the session gauges
+SESSION_TTL_SECONDS = 15 * 60
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes the labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type}\n"
+        return header + "".join(f"{sample}\n" for sample in self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def set_total(self, total: float, **labels: str) -> None:
+        """Mirror a running total kept elsewhere, such as the hits of a cache."""
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = total
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = dict(self._series)
+        for key, value in series.items():
+            yield f"{self.name}_total{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = dict(self._series)
+        for key, value in series.items():
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        # Index of the first bucket holding the value; cumulated when rendered
+        bucket = next(index for index, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * len(self.buckets), 0.0))
+            counts[bucket] += 1
+            self._series[key] = (counts, total + value)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class timed(ContextDecorator):
+    """Observe the seconds spent in a block or a function, even when it raises."""
+
+    def __init__(self, histogram: Histogram, **labels: str):
+        self.histogram = histogram
+        self.labels = labels
+        self._starts = threading.local()
+
+    def __enter__(self) -> "timed":
+        # A stack per thread, so one decorated function can run in several sessions at once
+        self._starts.__dict__.setdefault("stack", []).append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self._starts.stack.pop(), **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+        self._callbacks: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def on_scrape(self, callback: Callable[[], None]) -> None:
+        """Run ``callback`` before every scrape, to refresh values read from elsewhere."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def render(self) -> str:
+        with self._lock:
+            callbacks, metrics = list(self._callbacks), list(self._metrics)
+        for callback in callbacks:
+            callback()
+        return "".join(metric.render() for metric in metrics)
+
+
+REGISTRY = Registry()
+
+LOAD_SECONDS = REGISTRY.register(
+    Histogram("sahel_load_seconds", "Time spent loading data for a page", ("source",))
+)
+CHART_SECONDS = REGISTRY.register(
+    Histogram("sahel_create_chart_seconds", "Time spent building or fetching a figure", ("chart",))
+)
+PLOT_SECONDS = REGISTRY.register(
+    Histogram("sahel_plot_seconds", "Time spent handing a figure to Streamlit", ("key",))
+)
+VIDEO_READ_SECONDS = REGISTRY.register(
+    Histogram("sahel_video_read_seconds", "Time spent reading a timelapse video")
+)
+PAGE_RUN_SECONDS = REGISTRY.register(
+    Histogram("sahel_page_run_seconds", "Duration of complete page script runs", ("page",))
+)
+PAYLOAD_BYTES = REGISTRY.register(
+    Histogram("sahel_payload_bytes", "Bytes handed to the browser per element", ("element",), BYTES_BUCKETS)
+)
+CACHE_REQUESTS = REGISTRY.register(
+    Counter("sahel_cache_requests", "Cache lookups by cache and result", ("cache", "result"))
+)
+CACHE_EVICTIONS = REGISTRY.register(Counter("sahel_cache_evictions", "Cache evictions", ("cache",)))
+CACHE_BYTES = REGISTRY.register(Gauge("sahel_cache_bytes", "Bytes held by a cache", ("cache",)))
+SESSION_STATE_BYTES = REGISTRY.register(
+    Histogram(
+        "sahel_session_state_bytes",
+        "Private session state size at the end of each page run",
+        buckets=BYTES_BUCKETS,
+    )
+)
+SESSIONS = REGISTRY.register(Gauge("sahel_sessions", "Sessions that ran a page recently"))
+SESSIONS_STATE_BYTES = REGISTRY.register(
+    Gauge("sahel_sessions_state_bytes", "Private state of the recent sessions, as of their last run")
+)
+RESIDENT_BYTES = REGISTRY.register(
+    Gauge("sahel_process_max_resident_bytes", "Peak resident memory of the app process")
+)
+
+_sessions: dict[str, tuple[float, int]] = {}
+_sessions_lock = threading.Lock()
+
+
+def record_session(session: str, nbytes: int) -> None:
+    """Note the private state size of a session at the end of one of its runs."""
+    SESSION_STATE_BYTES.observe(nbytes)
+    with _sessions_lock:
+        _sessions[session] = (time.monotonic(), nbytes)
+
+
+def _refresh_process() -> None:
+    cutoff = time.monotonic() - SESSION_TTL_SECONDS
+    with _sessions_lock:
+        for session in [session for session, (seen, _) in _sessions.items() if seen < cutoff]:
+            del _sessions[session]
+        SESSIONS.set(len(_sessions))
+        SESSIONS_STATE_BYTES.set(sum(nbytes for _, nbytes in _sessions.values()))
+
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    RESIDENT_BYTES.set(peak if sys.platform == "darwin" else peak * 1024)
+
+
+REGISTRY.on_scrape(_refresh_process)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass  # scrapes every few seconds would flood the Streamlit log
+
+
+_server: ThreadingHTTPServer | None = None
+_server_lock = threading.Lock()
+
+
+def serve() -> ThreadingHTTPServer | None:
+    """Start the metrics endpoint once per process, in a daemon thread."""
+    global _server
+    port = int(os.environ.get("SAHEL_METRICS_PORT", DEFAULT_PORT))
+    with _server_lock:
+        if _server is not None or port == 0:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((os.environ.get("SAHEL_METRICS_HOST", DEFAULT_HOST), port), _Handler)
+        except OSError:
+            return None  # another process (or a reloaded module) already serves the port
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
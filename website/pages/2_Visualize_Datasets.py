@@ -1,7 +1,12 @@
+import html
+
 import streamlit as st
 #from openai import OpenAI
+#from utils import chat_system_prompt
+
+from utils import VIDEO_FOLDER, DATA_LIST, DATASET_MAPPING, RENDER_MODES, MAP_ZOOM, MAX_ZOOM, get_chart, plot, store, load_statistics, load_zonal_table, inspect_location, create_history_chart, point_index, create_change_chart, load_class_history, transition_frame, read_video, PageRun, PAYLOAD_BYTES, EXPORT_CLIPS, export, prepare_export, export_url, viewport_bounds, zonal, TIMELAPSE_MODES, create_animation
 
-from utils import BASE_DATA_FOLDER, VIDEO_FOLDER, DATA_LIST, create_chart, plot
+page_run = PageRun("visualize")
 
 # configure page
 st.set_page_config(
@@ -100,19 +105,7 @@ page_subtitle = f"In this page, you can visualize the data about {page_section}
 st.title(page_title)
 st.markdown(page_subtitle)
 
-files = [
-    file.resolve()
-    for file in (BASE_DATA_FOLDER / selected_location[0]).iterdir()
-    if file.is_file()
-]
-
-years = sorted(
-    {
-        int(file.name.split("_")[-1].split(".")[0])
-        for file in files
-        if file.name.endswith(".csv")
-    }
-)
+years = store.years(selected_location[0])
 
 
 # Year range
@@ -124,12 +117,22 @@ year = st.sidebar.slider(
     step=years[1] - years[0],
 )
 
-# Download button
-st.sidebar.download_button(
-    label="Download CSV",
-    data=files[0].read_bytes(),
-    file_name=f"{selected_location[0]}-{year}.csv",
-    mime="text/csv",
+# Map rendering mode
+render_mode = st.sidebar.radio(
+    "Map rendering",
+    options=list(RENDER_MODES),
+    format_func=RENDER_MODES.get,
+    help="Dense grids are drawn as an image overlay, which keeps the page fast.",
+)
+
+# Map zoom: the map reads the overview level matching it, around the inspected location
+zoom = st.sidebar.slider(
+    "Map zoom",
+    min_value=MAP_ZOOM,
+    max_value=MAX_ZOOM,
+    value=MAP_ZOOM,
+    step=0.5,
+    help="Zooming in centres the map on the inspected location and loads finer detail.",
 )
 
 if year >= 2024:
@@ -143,21 +146,165 @@ if year >= 2024:
 else:
     st.markdown(f"### {page[choice]['upper_name']} for year {year}")
 
-# Display selected chart based on user choice
-for file in files:
-    if f"{str(file.parent.name)}-{file.name}" not in st.session_state:
-        st.session_state[f"{str(file.parent.name)}-{file.name}"] = create_chart(file)
-
-# Display the chart
-plot(st.session_state[f"{selected_location[0]}-{year}.csv"])
+# A click on the map (point rendering) moves the inspected location; typed
+# coordinates win until the next click
+selection = st.session_state.get("map")
+clicked = [point for point in selection.selection.points if "lon" in point and "lat" in point] if selection else []
+if clicked and clicked[0] != st.session_state.get("inspect_click"):
+    st.session_state.inspect_click = clicked[0]
+    st.session_state.inspect_lon = float(clicked[0]["lon"])
+    st.session_state.inspect_lat = float(clicked[0]["lat"])
+elif "inspect_lon" not in st.session_state:
+    west, south, east, north = point_index(selected_location[0]).grid.bounds
+    st.session_state.inspect_lon = (west + east) / 2
+    st.session_state.inspect_lat = (south + north) / 2
+center = (st.session_state.inspect_lon, st.session_state.inspect_lat)
+
+# Export of the selected year: written only when asked for, then reused from the export cache
+st.sidebar.markdown("### Export")
+formats = export.available_formats()
+export_format = st.sidebar.selectbox("Format", options=list(formats), format_func=lambda key: formats[key].label)
+clip = st.sidebar.radio("Area", options=list(EXPORT_CLIPS), format_func=EXPORT_CLIPS.get)
+district = None
+if clip == "district":
+    district = ("districts", st.sidebar.selectbox("District", options=zonal.zone_names("districts")))
+request = export.ExportRequest(
+    selected_location[0],
+    year,
+    export_format,
+    bounds=viewport_bounds(zoom, center) if clip == "view" else None,
+    zone=district,
+)
+if st.sidebar.button("Prepare download"):
+    st.session_state.export_request = request
+if st.session_state.get("export_request") == request:
+    path = prepare_export(request)
+    url = export_url(path)
+    if url is not None:
+        # A plain link: the static route streams the file, so the app never reads it
+        st.sidebar.markdown(
+            f'<a href="{url}" download="{html.escape(request.file_name)}">Download {html.escape(request.file_name)}</a>',
+            unsafe_allow_html=True,
+        )
+    else:
+        PAYLOAD_BYTES.observe(path.stat().st_size, element="download_button")
+        # The button hands Streamlit the whole file on every run it is shown in, so it
+        # goes away once clicked; the export stays cached for the next "Prepare download"
+        with open(path, "rb") as file:
+            st.sidebar.download_button(
+                label=f"Download {request.file_name}",
+                data=file,
+                file_name=request.file_name,
+                mime=request.mime,
+                on_click=lambda: st.session_state.pop("export_request", None),
+            )
+
+# Display the chart of the selected year only; its neighbours are prefetched
+plot(get_chart(selected_location[0], year, years, render_mode, zoom, center), "map", on_select="rerun")
+
+# Location history
+st.markdown("## 📍 Inspect a location")
+lon_column, lat_column = st.columns(2)
+lon = lon_column.number_input("Longitude", format="%.4f", step=0.01, key="inspect_lon")
+lat = lat_column.number_input("Latitude", format="%.4f", step=0.01, key="inspect_lat")
+
+history = inspect_location(lon, lat)
+if history.empty:
+    st.info("No dataset has data at this location. Click a cell on the map or move the coordinates.")
+else:
+    st.caption("Click a cell on the map with point rendering to inspect it. Forecast years are dashed.")
+    st.plotly_chart(create_history_chart(history), use_container_width=True)
+
+# Summary of the selected year, read from the precomputed statistics index
+if selected_location[0] != "land_cover":
+    summary = load_statistics()[selected_location[0]]
+    position = summary["year"].index(year)
+    unit = DATASET_MAPPING[selected_location[0]].value.column_name
+    for column, key, label in zip(
+        st.columns(4), ("min", "mean", "max", "std"), ("Minimum", "Mean", "Maximum", "Std. deviation")
+    ):
+        column.metric(f"{label} ({unit})", f"{summary[key][position]:,.1f}")
+
+    with st.expander("Distribution of the values"):
+        edges = summary["histogram"]["edges"]
+        st.bar_chart(
+            {
+                unit: [f"{low:,.0f}-{high:,.0f}" for low, high in zip(edges, edges[1:])],
+                "cells": summary["histogram"]["counts"][position],
+            },
+            x=unit,
+            y="cells",
+        )
+
+    # District statistics, from zone masks rasterized once per grid
+    st.markdown("## 🏘️ Statistics by area")
+    layer = st.radio(
+        "Areas",
+        options=["districts", "regions"],
+        format_func=str.capitalize,
+        horizontal=True,
+    )
+    zones = load_zonal_table(selected_location[0], layer)
+    current = zones[(zones["year"] == year) & (zones["count"] > 0)]
+    st.dataframe(
+        current[["zone", "mean", "min", "p50", "max", "sum", "count"]]
+        .sort_values("mean", ascending=False)
+        .rename(columns={"zone": layer.capitalize()[:-1], "p50": "median", "count": "cells"}),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            column: st.column_config.NumberColumn(format="%.1f")
+            for column in ("mean", "min", "median", "max", "sum")
+        },
+    )
+
+    selected_zones = st.multiselect(
+        "Compare the mean over the years",
+        options=current["zone"].tolist(),
+        default=current.nlargest(3, "mean")["zone"].tolist(),
+    )
+    history = zones[zones["zone"].isin(selected_zones) & (zones["count"] > 0)]
+    st.line_chart(
+        history.pivot(index="year", columns="zone", values="mean"),
+        x_label="Year",
+        y_label=unit,
+    )
+
+# Class changes between any two years, from the cached pairwise transition table
+if selected_location[0] == "land_cover":
+    st.markdown("## 🔄 Land cover change")
+    from_column, to_column = st.columns(2)
+    first = from_column.selectbox("From year", options=years, index=0)
+    second = to_column.selectbox("To year", options=years, index=len(years) - 1)
+
+    history = load_class_history(selected_location[0])
+    changed = int(history.changed(first, second).sum())
+    both = int(history.transitions(first, second).sum())
+    st.metric(
+        "Cells that changed class",
+        f"{changed:,}",
+        f"{changed / max(both, 1):.2%} of the area",
+        delta_color="off",
+    )
+    plot(create_change_chart(selected_location[0], first, second), "change")
+    with st.expander("Transition matrix (cells)"):
+        st.dataframe(transition_frame(selected_location[0], first, second), use_container_width=True)
 
 st.markdown("## ⏳ Timelapse of the data")
-video_file = open(page[choice]["timelapse"], "rb")
-video_bytes = video_file.read()
 st.markdown(
     f"In this section you can see a timelapse of the {page[choice]['name']} data from {page[choice]['start_date']} to {page[choice]['end_date']}."
 )
-st.video(video_bytes)
+timelapse_mode = st.radio(
+    "Timelapse",
+    options=list(TIMELAPSE_MODES),
+    format_func=TIMELAPSE_MODES.get,
+    horizontal=True,
+    help="The interactive map is animated in the browser from the stored data, forecasts included.",
+)
+if timelapse_mode == "video":
+    st.video(read_video(page[choice]["timelapse"]), format="video/mp4")
+else:
+    plot(create_animation(selected_location[0]), "animation")
 
 st.markdown("## 🔎 Insights & Analysis based on the data")
 st.markdown(page[choice]["insights"])
@@ -166,37 +313,7 @@ st.markdown(page[choice]["insights"])
 # def ai_chat():
 #     AI_API_ENDPOINT = st.secrets["AI_API_ENDPOINT"]
 #     AI_API_TOKEN = st.secrets["AI_API_TOKEN"]
-#     SYSTEM_PROMPT = """\
-# You are an expert from the G20 Global Land Initiative led by the United Nations Convention to Combat Desertification (UNCCD).
-# Your role is to provide data-driven answers, insights, and recommendations based mainly on the data I will give you, and also on the public available data about Sahel desert.
-# You must only answer questions about the Sahel desert region in Africa. Be concise. Avoid mentioning the source you used.
-
-# Datatypes about the last 20 years of the Sahel region. We are in 2023, data after 2023 is a prediction.
-# Each value at position `n` corresponds to the year in position `n` of the current datatype.
-# <datatype>
-# name: population_density
-# year: [2010, 2015, 2020, 2025, 2030, 2035]
-# min: [0, 0, 0, 0, 0, 0]
-# max: [1225, 1224, 1802, 1832, 2409, 2439]
-# mean: [8, 9, 10, 11, 12, 12]
-# std: [26, 27, 36, 37, 45, 46]
-# </datatype>
-# <datatype>
-# name: gross_primary
-# year: [2010, 2011, 2012, 2013, 2014, 2015, 2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023]
-# min: [266, 199, 370, 306, 272, 212, 316, 171, 231, 203, 307, 178, 229, 233]
-# max: [65533, 65533, 65533, 65533, 65533, 65533, 65533, 65533, 65533, 65533, 65533, 65533, 65533, 65533]
-# mean: [24423, 23966, 24425, 24136, 24054, 24145, 24458, 23890, 24068, 24053, 24456, 23944, 24722, 24178]
-# std: [30675, 31013, 30671, 30886, 30948, 30880, 30648, 31069, 30938, 30949, 30651, 31030, 30453, 30856]
-# </datatype>
-# <datatype>
-# name: climate_precipitation
-# year: [2010, 2011, 2012, 2013, 2014, 2015, 2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024, 2025, 2026, 2027, 2028, 2029, 2030, 2031, 2032, 2033, 2034, 2035, 2036, 2037, 2038, 2039, 2040]
-# min: [85, 41, 55, 54, 40, 49, 57, 45, 51, 37, 53, 42, 58, 52, 47, 0, 44, 48, 55, 48, 55, 21, 50, 50, 50, 48, 49, 35, 50, 47, 53]
-# max: [500, 367, 609, 484, 440, 500, 578, 415, 542, 442, 690, 441, 566, 511, 626, 460, 573, 542, 599, 487, 566, 544, 568, 514, 568, 531, 543, 534, 569, 518, 531]
-# mean: [358, 200, 351, 261, 236, 245, 295, 226, 256, 187, 354, 227, 315, 249, 324, 252, 303, 266, 310, 261, 301, 274, 299, 270, 297, 277, 295, 274, 295, 279, 292]
-# std: [103, 76, 136, 97, 103, 101, 115, 91, 109, 88, 160, 90, 148, 103, 155, 100, 144, 115, 142, 109, 140, 119, 137, 115, 137, 120, 133, 119, 135, 121, 131]
-# </datatype>"""
+#     SYSTEM_PROMPT = chat_system_prompt()
 
 #     client = OpenAI(base_url=AI_API_ENDPOINT, api_key=AI_API_TOKEN)
 
@@ -268,4 +385,6 @@ def poor_chat():
 
 
 #ai_chat()
-poor_chat()
\ No newline at end of file
+poor_chat()
+
+page_run.finish()
@@ -1,19 +1,94 @@
 from pathlib import Path
 from enum import Enum
 from dataclasses import dataclass
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import base64
+import math
+import os
 import sys
+import threading
+import time
 
+import numpy as np
 import pandas as pd
+import plotly.colors
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import streamlit as st
+from plotly.basedatatypes import BaseFigure
 from plotly.graph_objs import Figure
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from cache import shared_cache
+from metrics import (
+    CACHE_BYTES,
+    CACHE_EVICTIONS,
+    CACHE_REQUESTS,
+    CHART_SECONDS,
+    LOAD_SECONDS,
+    PAGE_RUN_SECONDS,
+    PAYLOAD_BYTES,
+    PLOT_SECONDS,
+    REGISTRY,
+    VIDEO_READ_SECONDS,
+    record_session,
+    serve,
+    timed,
+)
 
 dir = Path(__file__).resolve()
 
-# Use absolute path relative to the project root for cloud deployment
-BASE_DATA_FOLDER = dir.parent.parent / "dataset" / "csv"
+# The shared data layer lives in the project root
+sys.path.append(str(dir.parent.parent))
+from sahel import change, correlate, export, points, pyramid, regrid, render, stats, store, zonal  # noqa: E402
+from sahel.cube import RasterCube  # noqa: E402
+from sahel.grid import GridSpec, block_reduce  # noqa: E402
+
 VIDEO_FOLDER = dir.parent / "static" / "videos"
 IMAGE_FOLDER = dir.parent / "static" / "images"
+# Exports are written here so that Streamlit's static route streams them, with
+# range requests, instead of the app pushing their bytes through the websocket
+EXPORT_FOLDER = dir.parent / "static" / "exports"
+EXPORT_URL = "app/static/exports"
+# Streamlit answers 404 for larger static files
+STATIC_FILE_BYTES = 200 * 1024 * 1024
+
+# Set to read the per-zone statistics tables from the PostGIS copy loaded by
+# `python -m sahel.postgis`. Everything else (maps, point histories, statistics,
+# correlations and exports) still reads the local store, which every replica needs
+DATABASE_URL = os.environ.get("SAHEL_DATABASE_URL")
+
+# Figures kept per browser session, and threads that build neighbouring years
+CHART_CACHE_SIZE = 8
+PREFETCH_WORKERS = 2
+
+# Map rendering: maps read the coarsest overview level that still resolves a screen
+# pixel (POINT_CELL_PIXELS for markers) at the chosen zoom, never send more than
+# POINT_BUDGET points or MAX_IMAGE_SIDE² image cells, and zoomed in past MAP_ZOOM
+# only read the window of a VIEWPORT-sized map, so the payload stays bounded.
+MAP_ZOOM = 6.7
+MAX_ZOOM = 10.7
+VIEWPORT = (1200, 700)
+POINT_BUDGET = 20_000
+POINT_CELL_PIXELS = 4
+MAX_IMAGE_SIDE = 1024
+
+# Bins per axis of the pixel comparison heatmap on the Correlate page
+COMPARISON_BINS = 40
+LOCAL_CORRELATION_SCALE = "RdBu"
+MAX_WINDOW_RADIUS = 15
+# Years from this one on are forecasts, drawn dashed in the location history
+FIRST_FORECAST_YEAR = 2024
+# Colour of the cells whose class did not change on the change map
+UNCHANGED_COLOR = "#3a3a3a"
+RENDER_MODES = {"auto": "Automatic", "points": "Points", "image": "Image overlay"}
+TIMELAPSE_MODES = {"video": "Video", "animation": "Interactive map"}
+# Colour steps of the animated maps, so every frame is one byte per cell
+ANIMATION_LEVELS = 256
+ANIMATION_FRAME_MS = 700
+EXPORT_CLIPS = {"all": "Whole dataset", "view": "Current map view", "district": "One district"}
 
 @dataclass
 class DatasetConfig:
@@ -81,12 +156,38 @@ class DatasetType(Enum):
         name="🧍🏻 Population Density",
         column_name="people/km²"
     )
+    DISTANCE_ROAD = DatasetConfig(
+        name="🛣️ Distance to Main Roads",
+        column_name="km",
+        color_scale="magma_r"
+    )
+    DISTANCE_WATER = DatasetConfig(
+        name="💧 Distance to Streamwater",
+        column_name="km",
+        color_scale="ice_r"
+    )
 
+# Only offer the datasets that have been imported into the store
 DATA_LIST = {
-    "climate_precipitation": {"name": DatasetType.CLIMATE_PRECIPITATION.value.name},
-    "gross_primary": {"name": DatasetType.GROSS_PRIMARY.value.name},
-    "land_cover": {"name": DatasetType.LAND_COVER.value.name},
-    "population_density": {"name": DatasetType.POPULATION_DENSITY.value.name},
+    key: value
+    for key, value in {
+        "climate_precipitation": {"name": DatasetType.CLIMATE_PRECIPITATION.value.name},
+        "gross_primary": {"name": DatasetType.GROSS_PRIMARY.value.name},
+        "land_cover": {"name": DatasetType.LAND_COVER.value.name},
+        "population_density": {"name": DatasetType.POPULATION_DENSITY.value.name},
+    }.items()
+    if key in store.datasets()
+}
+
+# Static layers derived from the road and stream networks (python -m sahel.distance),
+# only offered where datasets are compared
+LAYER_LIST = {
+    key: value
+    for key, value in {
+        "distance_road": {"name": DatasetType.DISTANCE_ROAD.value.name},
+        "distance_water": {"name": DatasetType.DISTANCE_WATER.value.name},
+    }.items()
+    if key in store.datasets()
 }
 
 DATASET_MAPPING = {
@@ -94,17 +195,192 @@ DATASET_MAPPING = {
     "gross_primary": DatasetType.GROSS_PRIMARY,
     "land_cover": DatasetType.LAND_COVER,
     "population_density": DatasetType.POPULATION_DENSITY,
+    "distance_road": DatasetType.DISTANCE_ROAD,
+    "distance_water": DatasetType.DISTANCE_WATER,
 }
 
 
-@st.cache_data
+def _refresh_cache_metrics() -> None:
+    stats = shared_cache.stats()
+    CACHE_REQUESTS.set_total(stats["hits"], cache="shared", result="hit")
+    CACHE_REQUESTS.set_total(stats["misses"], cache="shared", result="miss")
+    CACHE_EVICTIONS.set_total(stats["evictions"], cache="shared")
+    CACHE_BYTES.set(stats["bytes"], cache="shared")
+
+
+REGISTRY.on_scrape(_refresh_cache_metrics)
+serve()
+
+
 @st.cache_resource
-def create_chart(file: Path) -> Figure:
-    df = pd.read_csv(file)
-    
+def load_statistics() -> dict:
+    """Per-dataset, per-year aggregates and histograms, loaded once per process."""
+    return stats.load_index()
+
+
+def chat_system_prompt() -> str:
+    return f"""\
+You are an expert from the G20 Global Land Initiative led by the United Nations Convention to Combat Desertification (UNCCD).
+Your role is to provide data-driven answers, insights, and recommendations based mainly on the data I will give you, and also on the public available data about Sahel desert.
+You must only answer questions about the Sahel desert region in Africa. Be concise. Avoid mentioning the source you used.
+
+Datatypes about the last 20 years of the Sahel region. We are in 2023, data after 2023 is a prediction.
+Each value at position `n` corresponds to the year in position `n` of the current datatype.
+{stats.prompt_context(load_statistics())}"""
+
+
+@st.cache_resource
+def database():
+    """The pooled PostGIS backend, opened once per process when DATABASE_URL is set."""
+    from sahel import postgis
+
+    return postgis.PostgisBackend(DATABASE_URL)
+
+
+@timed(LOAD_SECONDS, source="export")
+def prepare_export(request: export.ExportRequest) -> Path:
+    """The file of an export, written on the first request and then read from the export cache."""
+    try:
+        return export.export(request, EXPORT_FOLDER)
+    except OSError:
+        return export.export(request)  # read-only deployments fall back to the store's cache
+
+
+def export_url(path: Path) -> str | None:
+    """URL of an export on Streamlit's static route, or None if it cannot be served there."""
+    if path.parent != EXPORT_FOLDER or path.stat().st_size > STATIC_FILE_BYTES:
+        return None
+    return f"{EXPORT_URL}/{path.name}"
+
+
+@timed(LOAD_SECONDS, source="zonal")
+def load_zonal_table(dataset: str, layer: str = "districts") -> pd.DataFrame:
+    """Per-zone statistics of every year, shared by every session. Do not modify the result."""
+    return shared_cache.get_or_create(
+        ("zonal", dataset, layer),
+        lambda: (
+            database().zonal_table(dataset, layer) if DATABASE_URL
+            else zonal.zonal_table(load_cube(dataset), layer)
+        ),
+        sizeof=lambda df: int(df.memory_usage(deep=True).sum()),
+    )
+
+
+@timed(LOAD_SECONDS, source="pyramid")
+def load_pyramid(dataset: str) -> pyramid.Pyramid:
+    """The overview pyramid of a dataset, shared by every session. Do not modify the result."""
+    return shared_cache.get_or_create(
+        ("pyramid", dataset),
+        lambda: pyramid.load_pyramid(dataset, is_categorical(dataset)),
+        sizeof=lambda levels: levels.nbytes,
+    )
+
+
+def load_regrid_map(source: GridSpec, target: GridSpec, method: str) -> regrid.RegridMap:
+    """The resampling map between two grids, shared by every session."""
+    return shared_cache.get_or_create(
+        ("regrid", source, target, method),
+        lambda: regrid.regrid_map(source, target, method),
+        sizeof=lambda regrid_map: regrid_map.nbytes,
+    )
+
+
+def point_index(dataset: str) -> points.PointIndex:
+    """The point index of a dataset, shared by every session and rebuilt when the store changes."""
+    return shared_cache.get_or_create(
+        ("points", dataset, points.stamp(dataset)),
+        lambda: points.point_index(dataset),
+        sizeof=lambda index: index.pixels.nbytes,
+    )
+
+
+def load_cube(dataset: str) -> RasterCube:
+    """Every year of a dataset as a dense cube, shared by every session. Do not modify the result."""
+    return load_pyramid(dataset).levels[0]
+
+
+def degrees_per_pixel(zoom: float) -> float:
+    """Longitude covered by one screen pixel at a map zoom level."""
+    return 360 / (256 * 2**zoom)
+
+
+def viewport_bounds(zoom: float, center: tuple[float, float]) -> tuple[float, float, float, float]:
+    """``(west, south, east, north)`` seen in a map of VIEWPORT pixels around ``center``."""
+    lon, lat = center
+    half_width = VIEWPORT[0] / 2 * degrees_per_pixel(zoom)
+    # Web Mercator shrinks latitude spans by cos(latitude)
+    half_height = VIEWPORT[1] / 2 * degrees_per_pixel(zoom) * math.cos(math.radians(lat))
+    return lon - half_width, lat - half_height, lon + half_width, lat + half_height
+
+
+def create_chart(
+    dataset: str,
+    year: int,
+    mode: str = "auto",
+    zoom: float = MAP_ZOOM,
+    center: tuple[float, float] | None = None,
+) -> Figure:
+    """The map of one year, shared by every session. Do not modify the result.
+
+    `mode` is one of RENDER_MODES: "points" sends one marker per cell, "image"
+    rasterizes the grid server-side into a PNG overlay, and "auto" picks the image
+    for views denser than POINT_BUDGET. Cells come from the coarsest pyramid level
+    that still resolves the screen pixels at `zoom`; zoomed in past MAP_ZOOM, only
+    the window seen around `center` is read.
+    """
+    return _chart(dataset, year, mode, zoom, center)[1]
+
+
+@timed(CHART_SECONDS, chart="map")
+def _chart(
+    dataset: str, year: int, mode: str, zoom: float, center: tuple[float, float] | None
+) -> tuple[tuple, Figure]:
+    """The shared-cache key of a map along with the map itself."""
+    levels = load_pyramid(dataset)
+    bounds = viewport_bounds(zoom, center) if center is not None and zoom > MAP_ZOOM else None
+    if mode == "auto":
+        mode = "image" if levels.cells(0, bounds) > POINT_BUDGET else "points"
+
+    if mode == "image":
+        level = levels.choose(degrees_per_pixel(zoom), bounds, budget=MAX_IMAGE_SIDE**2)
+    else:
+        level = levels.choose(degrees_per_pixel(zoom) * POINT_CELL_PIXELS, bounds, budget=POINT_BUDGET)
+    grid, layer = levels.window(level, year, bounds)
+    view = (zoom, center if bounds is not None else None)
+
+    key = ("chart", dataset, year, mode, grid, view)
+    return key, shared_cache.get_or_create(
+        key,
+        lambda: (_build_image_chart if mode == "image" else _build_chart)(dataset, grid, layer, *view),
+        sizeof=figure_bytes,
+    )
+
+
+def _marker_size(resolution: float, zoom: float = MAP_ZOOM) -> float:
+    """Marker diameter that roughly fills one grid cell at the given zoom."""
+    return max(3, resolution / degrees_per_pixel(zoom))
+
+
+def _map_center(grid: GridSpec, center: tuple[float, float] | None) -> dict:
+    west, south, east, north = grid.bounds
+    lon, lat = center or ((west + east) / 2, (north + south) / 2)
+    return dict(lat=lat, lon=lon)
+
+
+def _build_chart(
+    dataset: str,
+    grid: GridSpec,
+    layer: np.ndarray,
+    zoom: float = MAP_ZOOM,
+    center: tuple[float, float] | None = None,
+) -> Figure:
     # Get dataset configuration
-    dataset_type = DATASET_MAPPING.get(file.parent.name)
+    dataset_type = DATASET_MAPPING.get(dataset)
     config = dataset_type.value
+
+    lon, lat = grid.centers()
+    rows, cols = np.nonzero(~np.isnan(layer))
+    df = pd.DataFrame({"lon": lon[cols], "lat": lat[rows], "value": layer[rows, cols]})
     
     # Apply value mapping if it exists (for land cover)
     if config.value_mapping:
@@ -126,7 +402,8 @@ def create_chart(file: Path) -> Figure:
         df,
         lat="lat",
         lon="lon",
-        zoom=6.7,
+        zoom=zoom,
+        center=_map_center(grid, center),
         color=color_column,
         color_continuous_scale=color_scale,
         color_discrete_map=color_map,
@@ -134,12 +411,604 @@ def create_chart(file: Path) -> Figure:
         height=700,
     )
 
-    fig.update_traces(marker=dict(size=max(3, 9000 / len(df))))
+    fig.update_traces(marker=dict(size=_marker_size(grid.xres, zoom)))
 
     return fig
 
 
-@st.cache_data
-@st.cache_resource
-def plot(chart: Figure, key: str = ""):
-    st.plotly_chart(chart, use_container_width=True, key=key)
\ No newline at end of file
+def _build_image_chart(
+    dataset: str,
+    grid: GridSpec,
+    dense: np.ndarray,
+    zoom: float = MAP_ZOOM,
+    center: tuple[float, float] | None = None,
+) -> Figure:
+    config = DATASET_MAPPING.get(dataset).value
+    categorical = config.color_scale == "discrete"
+
+    fig = go.Figure()
+
+    if categorical:
+        colors = {code: config.color_map[name] for code, name in config.value_mapping.items()}
+        rgba = render.colorize_categories(dense, colors)
+        # Empty traces only carry the legend entries of the classes on the map
+        for code in np.unique(dense[~np.isnan(dense)]):
+            name = config.value_mapping.get(int(code), str(code))
+            fig.add_trace(
+                go.Scattermap(lat=[None], lon=[None], mode="markers", name=name,
+                              marker=dict(size=10, color=colors.get(int(code))))
+            )
+        fig.update_layout(legend_title_text=config.column_name)
+    else:
+        vmin, vmax = float(np.nanmin(dense)), float(np.nanmax(dense))
+        rgba = _colorize(dense, config.color_scale, vmin, vmax)
+        fig.add_trace(_colorbar_trace(grid, config.color_scale, vmin, vmax, config.column_name))
+
+    return _add_image_layer(fig, grid, rgba, zoom=zoom, center=center)
+
+
+def _colorize(dense: np.ndarray, color_scale: str, vmin: float, vmax: float) -> np.ndarray:
+    stops = [color for _, color in plotly.colors.get_colorscale(color_scale)]
+    return render.colorize(dense, render.colormap_lut(stops), vmin, vmax)
+
+
+def _colorbar_trace(grid: GridSpec, color_scale: str, vmin: float, vmax: float, title: str) -> go.Scattermap:
+    """An invisible trace that only carries the colour bar of an image overlay."""
+    west, south, east, north = grid.bounds
+    return go.Scattermap(
+        lat=[(north + south) / 2] * 2,
+        lon=[(west + east) / 2] * 2,
+        mode="markers",
+        hoverinfo="skip",
+        showlegend=False,
+        marker=dict(
+            size=0,
+            color=[vmin, vmax],
+            colorscale=color_scale,
+            showscale=True,
+            colorbar=dict(title=title),
+        ),
+    )
+
+
+def _add_image_layer(
+    fig: Figure,
+    grid: GridSpec,
+    rgba: np.ndarray,
+    height: int = 700,
+    zoom: float = MAP_ZOOM,
+    center: tuple[float, float] | None = None,
+) -> Figure:
+    """Draw an RGBA array over the grid's bounds on a dark map."""
+    west, south, east, north = grid.bounds
+    image = base64.b64encode(render.encode_png(rgba)).decode()
+    fig.update_layout(
+        map=dict(
+            style="carto-darkmatter",
+            zoom=zoom,
+            center=_map_center(grid, center),
+            layers=[
+                dict(
+                    sourcetype="image",
+                    source=f"data:image/png;base64,{image}",
+                    coordinates=[[west, north], [east, north], [east, south], [west, south]],
+                    below="traces",
+                )
+            ],
+        ),
+        height=height,
+        margin=dict(t=60, l=0, r=0, b=0),
+    )
+
+    return fig
+
+
+@timed(LOAD_SECONDS, source="classes")
+def load_class_history(dataset: str) -> change.ClassHistory:
+    """The uint8 class history of a categorical dataset, shared by every session."""
+    return shared_cache.get_or_create(
+        ("classes", dataset),
+        lambda: change.ClassHistory.from_cube(load_cube(dataset)),
+        sizeof=lambda history: history.states.nbytes + history.table.nbytes,
+    )
+
+
+def transition_frame(dataset: str, first: int, second: int) -> pd.DataFrame:
+    """Cells going from each class (rows) in `first` to each class (columns) in `second`."""
+    history = load_class_history(dataset)
+    mapping = DATASET_MAPPING[dataset].value.value_mapping
+    names = [mapping.get(int(code), str(code)) for code in history.classes]
+    table = pd.DataFrame(
+        history.transitions(first, second),
+        index=pd.Index(names, name=f"{first} → {second}"),
+        columns=names,
+    )
+    # Classes absent from both years only add empty rows and columns
+    used = (table.sum(axis=0) > 0) | (table.sum(axis=1) > 0)
+    return table.loc[used, used]
+
+
+@timed(CHART_SECONDS, chart="change")
+def create_change_chart(dataset: str, first: int, second: int) -> Figure:
+    """Map of the cells whose class changed between two years, shared by every session."""
+    return shared_cache.get_or_create(
+        ("change", dataset, first, second),
+        lambda: _build_change_chart(dataset, first, second),
+        sizeof=figure_bytes,
+    )
+
+
+def _build_change_chart(dataset: str, first: int, second: int) -> Figure:
+    config = DATASET_MAPPING[dataset].value
+    history = load_class_history(dataset)
+    layer = history.change_layer(first, second)
+
+    colors = {-1: UNCHANGED_COLOR}
+    colors.update({code: config.color_map[name] for code, name in config.value_mapping.items()})
+    rgba = render.colorize_categories(layer, colors)
+
+    fig = go.Figure()
+    # Empty traces only carry the legend entries: unchanged, then the new classes
+    legend = {-1: "Unchanged"}
+    for code in np.unique(layer[~np.isnan(layer)]):
+        if code >= 0:
+            legend[int(code)] = config.value_mapping.get(int(code), str(code))
+    for code, name in legend.items():
+        fig.add_trace(
+            go.Scattermap(lat=[None], lon=[None], mode="markers", name=name,
+                          marker=dict(size=10, color=colors.get(code)))
+        )
+    fig.update_layout(legend_title_text=f"Class in {second}")
+    return _add_image_layer(fig, history.grid, rgba)
+
+
+@timed(CHART_SECONDS, chart="animation")
+def create_animation(dataset: str) -> Figure:
+    """Every year of a dataset as one animated map, shared by every session.
+
+    The cell positions are sent once; each frame only carries one byte per cell, an
+    index into the colour scale (or into the classes present, for land cover).
+    """
+    return shared_cache.get_or_create(
+        ("animation", dataset),
+        lambda: _build_animation(dataset),
+        sizeof=figure_bytes,
+    )
+
+
+def _build_animation(dataset: str) -> Figure:
+    config = DATASET_MAPPING[dataset].value
+    levels = load_pyramid(dataset)
+    cube = levels.levels[levels.choose(degrees_per_pixel(MAP_ZOOM) * POINT_CELL_PIXELS, budget=POINT_BUDGET)]
+
+    # Cells with data in every year, so one fixed set of markers serves every frame
+    dense = cube.dense()
+    rows, cols = np.nonzero(~np.isnan(dense).any(axis=0))
+    values = dense[:, rows, cols]
+    lon, lat = cube.grid.centers()
+
+    if is_categorical(dataset):
+        codes = np.unique(values)
+        frames = np.searchsorted(codes, values).astype(np.uint8)
+        names = [config.value_mapping.get(int(code), str(code)) for code in codes]
+        step = 1 / len(codes)
+        # Two stops per class give flat bands instead of a gradient
+        colorscale = [
+            [position, config.color_map.get(name, UNCHANGED_COLOR)]
+            for index, name in enumerate(names)
+            for position in (index * step, (index + 1) * step)
+        ]
+        color_range = dict(cmin=-0.5, cmax=len(codes) - 0.5)
+        colorbar = dict(title=config.column_name, tickvals=list(range(len(codes))), ticktext=names)
+    else:
+        # The colour range of the timelapse videos, so both agree
+        vmin, vmax = render.color_range(values)
+        scale = (ANIMATION_LEVELS - 1) / (vmax - vmin) if vmax > vmin else 0.0
+        frames = np.clip(np.round((values - vmin) * scale), 0, ANIMATION_LEVELS - 1).astype(np.uint8)
+        colorscale = config.color_scale
+        color_range = dict(cmin=0, cmax=ANIMATION_LEVELS - 1)
+        ticks = np.linspace(0, ANIMATION_LEVELS - 1, 5)
+        colorbar = dict(
+            title=config.column_name,
+            tickvals=ticks.tolist(),
+            ticktext=[f"{vmin + tick / scale:,.1f}" if scale else f"{vmin:,.1f}" for tick in ticks],
+        )
+
+    labels = [f"{year} (forecast)" if year >= FIRST_FORECAST_YEAR else str(year) for year in cube.years]
+    fig = go.Figure(
+        data=[
+            go.Scattermap(
+                lon=lon[cols].astype(np.float32),
+                lat=lat[rows].astype(np.float32),
+                mode="markers",
+                hoverinfo="skip",
+                marker=dict(
+                    size=_marker_size(cube.grid.xres),
+                    color=frames[0],
+                    colorscale=colorscale,
+                    colorbar=colorbar,
+                    **color_range,
+                ),
+            )
+        ],
+        frames=[
+            go.Frame(data=[go.Scattermap(marker=dict(color=frame))], traces=[0], name=label)
+            for label, frame in zip(labels, frames)
+        ],
+    )
+
+    play = {"frame": {"duration": ANIMATION_FRAME_MS, "redraw": True}, "fromcurrent": True, "transition": {"duration": 0}}
+    jump = {"frame": {"duration": 0, "redraw": True}, "mode": "immediate", "transition": {"duration": 0}}
+    fig.update_layout(
+        map=dict(style="carto-darkmatter", zoom=MAP_ZOOM, center=_map_center(cube.grid, None)),
+        height=700,
+        margin=dict(t=0, l=0, r=0, b=0),
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="left",
+                x=0.01,
+                y=0.01,
+                xanchor="left",
+                yanchor="bottom",
+                buttons=[
+                    dict(label="▶", method="animate", args=[None, play]),
+                    dict(label="⏸", method="animate", args=[[None], jump]),
+                ],
+            )
+        ],
+        sliders=[
+            dict(
+                currentvalue={"prefix": "Year: "},
+                x=0.12,
+                len=0.85,
+                y=0.01,
+                yanchor="bottom",
+                steps=[dict(label=label, method="animate", args=[[label], jump]) for label in labels],
+            )
+        ],
+    )
+    return fig
+
+
+def is_categorical(dataset: str) -> bool:
+    return DATASET_MAPPING[dataset].value.color_scale == "discrete"
+
+
+def align_pair(
+    first: tuple[str, int], second: tuple[str, int]
+) -> tuple[GridSpec, np.ndarray, np.ndarray]:
+    """Two (dataset, year) layers resampled onto the coarser of their grids.
+
+    Shared by every session. Do not modify the result.
+    """
+    return shared_cache.get_or_create(
+        ("aligned", first, second),
+        lambda: _align_pair(first, second),
+        sizeof=lambda aligned: aligned[1].nbytes + aligned[2].nbytes,
+    )
+
+
+def _align_pair(
+    first: tuple[str, int], second: tuple[str, int]
+) -> tuple[GridSpec, np.ndarray, np.ndarray]:
+    cubes = [load_cube(dataset) for dataset, _ in (first, second)]
+    grid = regrid.coarser(cubes[0].grid, cubes[1].grid)
+    values1, values2 = (
+        regrid.regrid(
+            cube.layer(year), cube.grid, grid,
+            categorical=is_categorical(dataset), maps=load_regrid_map,
+        )
+        for cube, (dataset, year) in zip(cubes, (first, second))
+    )
+    return grid, values1, values2
+
+
+def correlation_summary(first: tuple[str, int], second: tuple[str, int]) -> dict[str, float]:
+    """Pearson and Spearman coefficients over the cells both layers cover."""
+    return shared_cache.get_or_create(
+        ("correlation", first, second),
+        lambda: correlate.summary(*align_pair(first, second)[1:]),
+        sizeof=lambda summary: 256,
+    )
+
+
+@timed(CHART_SECONDS, chart="local_correlation")
+def create_local_correlation_chart(
+    first: tuple[str, int], second: tuple[str, int], radius: int
+) -> Figure:
+    """Map of the Pearson coefficient in a moving window of ``2 * radius + 1`` cells."""
+    return shared_cache.get_or_create(
+        ("local_correlation", first, second, radius),
+        lambda: _build_local_correlation_chart(first, second, radius),
+        sizeof=figure_bytes,
+    )
+
+
+def _build_local_correlation_chart(
+    first: tuple[str, int], second: tuple[str, int], radius: int
+) -> Figure:
+    grid, values1, values2 = align_pair(first, second)
+    local = correlate.local_correlation(values1, values2, radius)
+
+    factor = math.ceil(max(grid.rows, grid.cols) / MAX_IMAGE_SIDE)
+    if factor > 1:
+        local = block_reduce(local, factor)
+
+    fig = go.Figure(_colorbar_trace(grid, LOCAL_CORRELATION_SCALE, -1, 1, "r"))
+    return _add_image_layer(fig, grid, _colorize(local, LOCAL_CORRELATION_SCALE, -1, 1), height=600)
+
+
+def _comparison_edges(dataset: str, values: np.ndarray) -> np.ndarray:
+    if is_categorical(dataset):
+        # One bin per class present
+        codes = np.unique(values)
+        middles = (codes[1:] + codes[:-1]) / 2
+        return np.concatenate([[codes[0] - 0.5], middles, [codes[-1] + 0.5]])
+    return np.linspace(values.min(), values.max(), COMPARISON_BINS + 1)
+
+
+@timed(CHART_SECONDS, chart="comparison")
+def create_comparison_chart(first: tuple[str, int], second: tuple[str, int]) -> Figure:
+    """Heatmap of how often each pair of values occurs in the same cell."""
+    return shared_cache.get_or_create(
+        ("comparison", first, second),
+        lambda: _build_comparison_chart(first, second),
+        sizeof=figure_bytes,
+    )
+
+
+def _build_comparison_chart(first: tuple[str, int], second: tuple[str, int]) -> Figure:
+    _, values1, values2 = align_pair(first, second)
+    both = ~np.isnan(values1) & ~np.isnan(values2)
+    x, y = values1[both], values2[both]
+
+    edges_x = _comparison_edges(first[0], x)
+    edges_y = _comparison_edges(second[0], y)
+    counts, _, _ = np.histogram2d(x, y, bins=[edges_x, edges_y])
+
+    names = [DATASET_MAPPING[dataset].value for dataset, _ in (first, second)]
+    fig = px.imshow(
+        np.log10(counts.T + 1),
+        x=(edges_x[1:] + edges_x[:-1]) / 2,
+        y=(edges_y[1:] + edges_y[:-1]) / 2,
+        origin="lower",
+        aspect="auto",
+        color_continuous_scale="viridis",
+        labels=dict(
+            x=f"{names[0].name} ({names[0].column_name})",
+            y=f"{names[1].name} ({names[1].column_name})",
+            color="log₁₀ cells",
+        ),
+        height=500,
+    )
+    return fig
+
+
+def year_slider(label: str, years: list[int], key: str) -> int:
+    """Sidebar year slider; static layers with a single year just show it."""
+    if len(years) == 1:
+        st.sidebar.caption(f"{label}: {years[0]} (static layer)")
+        return years[0]
+    return st.sidebar.slider(
+        label,
+        key=key,
+        min_value=int(years[0]),
+        max_value=int(years[-1]),
+        value=2023 if 2023 in years else 2020,
+        step=years[1] - years[0],
+    )
+
+
+@timed(LOAD_SECONDS, source="points")
+def inspect_location(lon: float, lat: float) -> pd.DataFrame:
+    """Every dataset's history at one point, one column per dataset that covers it."""
+    return points.inspect(list(DATA_LIST), lon, lat, index=point_index)
+
+
+def create_history_chart(history: pd.DataFrame) -> Figure:
+    """One panel per dataset of a location's history, with the forecast years dashed."""
+    fig = make_subplots(
+        rows=len(history.columns),
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.04,
+        subplot_titles=[DATASET_MAPPING[dataset].value.name for dataset in history.columns],
+    )
+    for row, dataset in enumerate(history.columns, start=1):
+        config = DATASET_MAPPING[dataset].value
+        series = history[dataset].dropna()
+        if config.value_mapping:
+            # Class codes are shown by name on a categorical axis
+            series = series.astype(int).map(config.value_mapping)
+
+        observed = series[series.index < FIRST_FORECAST_YEAR]
+        # The forecast starts from the last observed year so the two lines connect
+        forecast = series[series.index >= FIRST_FORECAST_YEAR]
+        if len(forecast) and len(observed):
+            forecast = pd.concat([observed.iloc[-1:], forecast])
+
+        for part, is_forecast in ((observed, False), (forecast, True)):
+            if part.empty:
+                continue
+            fig.add_trace(
+                go.Scatter(
+                    x=part.index,
+                    y=part.values,
+                    mode="lines+markers",
+                    line={
+                        "dash": "dash" if is_forecast else "solid",
+                        "color": px.colors.qualitative.Plotly[row - 1],
+                    },
+                    name=f"{config.name} ({'forecast' if is_forecast else 'observed'})",
+                    showlegend=False,
+                ),
+                row=row,
+                col=1,
+            )
+        fig.update_yaxes(title_text=config.column_name, row=row, col=1)
+
+    fig.update_layout(height=220 * len(history.columns) + 60, margin={"t": 40, "b": 20})
+    return fig
+
+
+def plot(chart: Figure, key: str = "", on_select: str = "ignore"):
+    """Draw a figure; with ``on_select="rerun"`` the clicked points are returned."""
+    nbytes = shared_cache.nbytes(chart)
+    PAYLOAD_BYTES.observe(figure_bytes(chart) if nbytes is None else nbytes, element="plotly_chart")
+    with timed(PLOT_SECONDS, key=key or "unkeyed"):
+        return st.plotly_chart(
+            chart, use_container_width=True, key=key, on_select=on_select, selection_mode="points"
+        )
+
+
+def figure_bytes(fig: Figure) -> int:
+    """Size of a figure's JSON; cached figures have it recorded in their cache entry."""
+    return len(fig.to_json())
+
+
+def read_video(path: str | Path) -> bytes:
+    """A timelapse, read once per version of the file and shared by every session.
+
+    Streamlit keeps media under an ID hashed from their bytes and serves them with
+    HTTP range support, so every rerun hands the browser the same URL and the video
+    is neither read nor sent again.
+    """
+    path = Path(path)
+    return _video_bytes(str(path), path.stat().st_mtime_ns)
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _video_bytes(path: str, mtime_ns: int) -> bytes:
+    with timed(VIDEO_READ_SECONDS), open(path, "rb") as file:
+        return file.read()
+
+
+def session_state_bytes(value, seen: set[int] | None = None) -> int:
+    """Approximate bytes held privately by a session's state.
+
+    Figures are references into the process-wide cache and are not counted.
+    """
+    seen = set() if seen is None else seen
+    if id(value) in seen or isinstance(value, BaseFigure):
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum())
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        items = [item for pair in value.items() for item in pair]
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        items = list(vars(value).values())
+    else:
+        items = []
+    return size + sum(session_state_bytes(item, seen) for item in items)
+
+
+class PageRun:
+    """Times one run of a page script and notes the size of the session's state.
+
+    Call ``finish`` as the last statement of the page; runs cut short by
+    ``st.rerun``, ``st.stop`` or an error are not observed.
+    """
+
+    def __init__(self, page: str):
+        self.page = page
+        self.start = time.perf_counter()
+
+    def finish(self) -> None:
+        PAGE_RUN_SECONDS.observe(time.perf_counter() - self.start, page=self.page)
+        context = get_script_run_ctx()
+        if context is not None:
+            record_session(context.session_id, session_state_bytes(st.session_state.to_dict()))
+
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="chart-prefetch")
+
+
+def _warm_chart(dataset: str, year: int, mode: str, view: tuple) -> tuple:
+    return _chart(dataset, year, mode, *view)[0]
+
+
+class ChartLRU:
+    """Bounded per-session record of the figures asked for or prefetched.
+
+    Each key maps to a future that resolves to the shared-cache key of its figure,
+    so a year that is still being prefetched in the background is simply waited on
+    instead of being built twice. The futures never hold the figures: those are
+    always looked up in the shared cache, so an evicted figure is freed (and rebuilt
+    if asked for again) and SAHEL_CACHE_BYTES bounds them all. Futures whose build
+    failed or whose figure was evicted are dropped and count as misses.
+    """
+
+    def __init__(self, maxsize: int = CHART_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._futures: OrderedDict[tuple, Future] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: tuple) -> Future | None:
+        """The future of a key, unless its build failed or its figure was evicted. Call under the lock."""
+        future = self._futures.get(key)
+        if future is not None and future.done() and (
+            future.exception() is not None or future.result() not in shared_cache
+        ):
+            del self._futures[key]
+            return None
+        return future
+
+    def _store(self, key: tuple, future: Future) -> None:
+        with self._lock:
+            self._futures[key] = future
+            self._futures.move_to_end(key)
+            while len(self._futures) > self.maxsize:
+                self._futures.popitem(last=False)
+
+    def get(self, dataset: str, year: int, mode: str = "auto", view: tuple = (MAP_ZOOM, None)) -> Figure:
+        key = (dataset, year, mode, view)
+        with self._lock:
+            future = self._live(key)
+        CACHE_REQUESTS.inc(cache="session_charts", result="miss" if future is None else "hit")
+
+        if future is not None:
+            # A failed prefetch is not re-raised here: the build below retries it
+            wait([future])
+        # The visible year is built right away instead of queueing behind prefetches
+        chart_key, figure = _chart(dataset, year, mode, *view)
+        done = Future()
+        done.set_result(chart_key)
+        self._store(key, done)
+        return figure
+
+    def prefetch(self, dataset: str, years: list[int], mode: str = "auto", view: tuple = (MAP_ZOOM, None)) -> None:
+        for year in years:
+            with self._lock:
+                if self._live((dataset, year, mode, view)) is not None:
+                    continue
+            self._store((dataset, year, mode, view), _prefetch_pool.submit(_warm_chart, dataset, year, mode, view))
+
+
+def get_chart(
+    dataset: str,
+    year: int,
+    years: list[int],
+    mode: str = "auto",
+    zoom: float = MAP_ZOOM,
+    center: tuple[float, float] | None = None,
+) -> Figure:
+    """Return the figure for one year and start building its neighbours in the background."""
+    if "charts" not in st.session_state:
+        st.session_state.charts = ChartLRU()
+    charts = st.session_state.charts
+
+    view = (zoom, center)
+    figure = charts.get(dataset, year, mode, view)
+
+    position = years.index(year)
+    charts.prefetch(dataset, [years[i] for i in (position - 1, position + 1) if 0 <= i < len(years)], mode, view)
+
+    return figure